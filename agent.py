@@ -19,9 +19,15 @@ class Agent(metaclass=abc.ABCMeta):
             player name.
         piece: Piece 
             The pieces used by the player. Piece.black or Piece.white
+        on_stats: callable
+            keyword argument, `on_stats(agent, record)` is called with the 
+            statistics record (a dict) of every play by the agents that 
+            collect them, such as `Minimax`. default is None, no record is 
+            made.
         """
         self.name = name
         self.piece = piece
+        self.on_stats = kwargs.get('on_stats', None)
 
     @abc.abstractmethod
     def play(self, board: np.ndarray, last_row: int = 0, last_col = 0, steps: int = 0):
@@ -42,3 +48,48 @@ class Agent(metaclass=abc.ABCMeta):
         row, col: the next position of play.
         """
         pass
+
+    def play_position(self, position):
+        """
+        Play on a `position.Position`.
+
+        The position may be changed while thinking, but is as it was when
+        returning, the play is made by the caller. The agents that keep a
+        state of the game, such as `Minimax`, use the candidates and the
+        hash of the position instead of copying and scanning the board.
+        By default, `play` is called with a copy of the board.
+
+        returns:
+        --------
+        row, col: the next position of play, None if stopped.
+        """
+        row, col = position.last
+        return self.play(position.board.copy(), row, col, position.steps)
+
+    def play_sparse(self, board):
+        """
+        Play on a `sparse.SparseBoard`, which is not changed.
+
+        By default, `play` is called with the window of the board around
+        the stones, see `SparseBoard.window`, so a game on a large or
+        unbounded board costs what a game on the window costs.
+
+        returns:
+        --------
+        row, col: the next position of play on the board, None if stopped.
+        """
+        grid, row0, col0 = board.window()
+        row, col = board.last
+        if board.steps > 0:
+            row, col = row - row0, col - col0
+        pos = self.play(grid, row, col, board.steps)
+        if pos is None:
+            return None
+        return int(pos[0]) + row0, int(pos[1]) + col0
+
+    def stop(self):
+        """
+        Stop the play in progress as soon as possible, called from another 
+        thread than the one of `play`. do nothing by default.
+        """
+        pass
@@ -0,0 +1,277 @@
+"""
+Headless tournament of two agents.
+
+The games are played by `gobang_cli.Game` without showing the board, and
+spread over a process pool. The agents swap colours every game, and game `i`
+starts with random opening plays drawn by the seed `seed + i`.
+
+The agents stop thinking by node and playout limits instead of the clock,
+see `LIMITS`, so a tournament gives the same results every run. An agent
+given a time limit (`time_limit`, `threat_time`) or more than one search
+thread (`workers`) plays by the speed of the machine, and its results
+change from run to run.
+
+Every game is written as one JSON line to the output file:
+
+    {"game": 0, "seed": 0, "black": "minimax:depth=2", "white": "random",
+     "winner": "black", "steps": 17, "moves": [[7, 7, 0.0], ...]}
+
+where `winner` is "black", "white" or null for a draw, and `moves` are
+(row, col, seconds) of the plays. `--record` also appends the games to a
+binary record file, see `gamerecord.py`.
+
+usage:
+
+    python arena.py minimax:depth=4 minimax:depth=2 -n 100 -j 8 -o results.jsonl
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import argparse
+import ast
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from jitcache import njit
+from gamerecord import RecordWriter, check_board
+from gobang_cli import Game
+from utils import Piece
+
+AGENTS = {
+    'mcts': 'mcts.MCTS',
+    'minimax': 'minimax.Minimax',
+    'random': 'random_agent.RandomAgent',
+}
+
+# the defaults of the agents in a tournament, limits that do not depend on
+# the clock. the playouts of MCTS are about 1 second of its default.
+LIMITS = {
+    'mcts': {'time_limit': None, 'playouts': 100000},
+    'minimax': {'threat_time': None},
+}
+
+
+def parse_agent(spec: str):
+    """
+    Parse the agent spec "name:key=value,key=value".
+
+    Returns
+    -------
+    cls: type
+        the Agent class.
+    kwargs: dict
+        the keyword arguments of the agent, the values are python literals
+        or strings, with the defaults of `LIMITS`.
+    """
+    import importlib
+    name, _, args = spec.partition(':')
+    if name not in AGENTS:
+        raise ValueError(f'unknown agent: {name}, choose from {list(AGENTS)}')
+    module, cls = AGENTS[name].rsplit('.', 1)
+    cls = getattr(importlib.import_module(module), cls)
+    kwargs = dict(LIMITS.get(name, {}))
+    for arg in filter(None, args.split(',')):
+        key, _, value = arg.partition('=')
+        try:
+            kwargs[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            kwargs[key] = value
+    return cls, kwargs
+
+
+@njit(cache=True)
+def seed_numba(seed: int):
+    """Seed the random generator of the njit functions."""
+    np.random.seed(seed)
+
+
+def opening_radius(size: int):
+    """The opening plays are within the radius from the center."""
+    center = size // 2
+    return min(2, center, size - 1 - center)
+
+
+def opening_plays(size: int, plays: int, seed: int):
+    """
+    Random plays near the center of the board, raises ValueError if there 
+    are not so many places near the center.
+    """
+    center = size // 2
+    radius = opening_radius(size)
+    if plays > (2 * radius + 1) ** 2:
+        raise ValueError(f'{plays} opening plays do not fit the '
+                         f'{2 * radius + 1}x{2 * radius + 1} cells at the '
+                         f'center of a {size}x{size} board.')
+    rng = np.random.default_rng(seed)
+    opening = []
+    while len(opening) < plays:
+        pos = tuple(int(x) for x in
+                    rng.integers(center - radius, center + radius + 1, 2))
+        if pos not in opening:
+            opening.append(pos)
+    return opening
+
+
+def warm_up(specs: tuple, size: int = 15):
+    """
+    Make a few plays by the agents, so the njit functions are compiled
+    before the timed games. run by every process of the pool.
+    """
+    from minimax import warm_up as warm_up_minimax
+    warm_up_minimax(size)
+    board = np.zeros((size, size), dtype=np.int32)
+    players = [cls(piece.name, piece, **kwargs) for (cls, kwargs), piece in
+               zip(map(parse_agent, specs), (Piece.black, Piece.white))]
+    row, col = -1, -1
+    for steps in range(4):
+        row, col = players[steps % 2].play(board, row, col, steps)
+        board[row, col] = players[steps % 2].piece.value
+
+
+def play_game(game: int, specs: tuple, size: int = 15, opening: int = 2,
+            seed: int = 0):
+    """
+    Play game `game` of the tournament.
+
+    Parameters
+    ----------
+    specs: tuple
+        specs of the 2 agents, see `parse_agent`. the first one is black in
+        the even games, and white in the odd ones.
+    size: int
+        the board is size by size.
+    opening: int
+        number of random opening plays.
+    seed: int
+        seed of the tournament, the game uses `seed + game`.
+
+    Returns
+    -------
+    record: dict
+        the result of the game, see the module docstring.
+    """
+    game_seed = seed + game
+    seed_numba(game_seed)
+    black, white = specs if game % 2 == 0 else specs[::-1]
+    players = []
+    for spec, piece in ((black, Piece.black), (white, Piece.white)):
+        cls, kwargs = parse_agent(spec)
+        kwargs.setdefault('seed', game_seed)
+        players.append(cls(piece.name, piece, **kwargs))
+    g = Game(np.zeros((size, size), dtype=np.int32))
+    winner = g.start(players, show=False,
+                     opening=opening_plays(size, opening, game_seed))
+    return {
+        'game': game,
+        'seed': game_seed,
+        'black': black,
+        'white': white,
+        'winner': None if winner is None else winner.piece.name,
+        'steps': g.steps,
+        'moves': [[int(r), int(c), round(t, 6)] for r, c, t in g.moves],
+    }
+
+
+def summary(records: list, first: bool = True):
+    """
+    Results of the first agent of the specs, or the second one.
+
+    Returns
+    -------
+    wins, draws, losses: int
+    seconds: float
+        mean seconds per play, the opening plays are not counted.
+    """
+    wins = draws = losses = 0
+    seconds = []
+    for record in records:
+        colour = 'black' if (record['game'] % 2 == 0) == first else 'white'
+        if record['winner'] is None:
+            draws += 1
+        elif record['winner'] == colour:
+            wins += 1
+        else:
+            losses += 1
+        start = 0 if colour == 'black' else 1
+        seconds += [t for r, c, t in record['moves'][start::2] if t > 0]
+    return wins, draws, losses, float(np.mean(seconds)) if seconds else 0.0
+
+
+def run(specs: tuple, games: int, size: int = 15, opening: int = 2,
+        seed: int = 0, workers: int = None, output: str = None,
+        record_file: str = None):
+    """
+    Play a tournament over a process pool.
+
+    Parameters
+    ----------
+    workers: int
+        number of processes, None for the number of cores.
+    output: str
+        file to write the records, one JSON line per game in the order of
+        the games, None for not writing.
+    record_file: str
+        binary record file to append the games, None for not writing.
+
+    see `play_game` for the others.
+
+    Returns
+    -------
+    records: list
+        the records of the games, in the order of the games.
+    """
+    # fail early on a bad spec, not in the workers.
+    for spec in specs:
+        parse_agent(spec)
+    if record_file:
+        check_board(size, size)
+    opening_plays(size, opening, seed)
+    records = []
+    f = open(output, 'w') if output else None
+    writer = RecordWriter(record_file) if record_file else None
+    try:
+        with ProcessPoolExecutor(workers, initializer=warm_up,
+                                 initargs=(specs, size)) as pool:
+            futures = [pool.submit(play_game, i, specs, size, opening, seed)
+                       for i in range(games)]
+            for future in futures:
+                record = future.result()
+                records.append(record)
+                if f is not None:
+                    f.write(json.dumps(record) + '\n')
+                    f.flush()
+                if writer is not None:
+                    writer.write(record['moves'], size, size, record['winner'],
+                                 record['black'], record['white'], opening)
+    finally:
+        if f is not None:
+            f.close()
+        if writer is not None:
+            writer.close()
+    return records
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Headless tournament of two agents.')
+    parser.add_argument('agents', nargs=2,
+                        help='agent specs, e.g. "minimax:depth=2,threats=False" or "random".')
+    parser.add_argument('-n', '--games', type=int, default=10)
+    parser.add_argument('-s', '--size', type=int, default=15)
+    parser.add_argument('--opening', type=int, default=2,
+                        help='number of random opening plays.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('-j', '--workers', type=int, default=os.cpu_count())
+    parser.add_argument('-o', '--output', default='arena.jsonl')
+    parser.add_argument('-r', '--record', default=None,
+                        help='binary record file to append the games.')
+    args = parser.parse_args()
+    cells = (2 * opening_radius(args.size) + 1) ** 2
+    if not 0 <= args.opening <= cells:
+        parser.error(f'--opening must be in [0, {cells}] on a '
+                     f'{args.size}x{args.size} board.')
+    records = run(tuple(args.agents), args.games, args.size, args.opening,
+                  args.seed, args.workers, args.output, args.record)
+    for i, spec in enumerate(args.agents):
+        wins, draws, losses, seconds = summary(records, i == 0)
+        print(f'{spec}: {wins} wins, {draws} draws, {losses} losses, '
+              f'{seconds * 1000:.1f} ms per play')
@@ -0,0 +1,215 @@
+"""
+Lock-step self-play of many games at once.
+
+The boards of N games are one (N, rows, cols) array, and every step plays
+one move in all the games not finished, by NumPy operations over the whole
+batch, so the cost of Python is paid once per step instead of once per
+play. The games are random or lightly guided playouts, for rollouts and
+statistics.
+
+A win is only possible on the lines through the last play, so the check
+gathers the 9 cells of the 4 lines around the plays of the batch from a
+board padded by 4 blanks, and looks for 5 in a row among them.
+
+usage:
+
+    python batch.py -n 10000 -s 15 --guided 2
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import argparse
+import time
+import numpy as np
+from utils import Piece
+
+PIECES_IN_LINE = 5
+# cells on each side of the play that a five through it can reach.
+PAD = PIECES_IN_LINE - 1
+DIRECTIONS = np.array([[0, 1], [1, 0], [1, 1], [1, -1]])
+OFFSETS = np.arange(-PAD, PAD + 1)
+
+
+def fives(boards: np.ndarray, value: int):
+    """
+    Check the whole boards for 5 in a row of `value`.
+
+    Returns
+    -------
+    won: np.ndarray
+        bool array of shape (N,).
+    """
+    b = boards == value
+    rows, cols = b.shape[1:]
+    k = PIECES_IN_LINE
+    won = np.zeros(b.shape[0], dtype=bool)
+    if cols >= k:
+        h = b[:, :, :cols - k + 1].copy()
+        for i in range(1, k):
+            h &= b[:, :, i:cols - k + 1 + i]
+        won |= h.any(axis=(1, 2))
+    if rows >= k:
+        v = b[:, :rows - k + 1, :].copy()
+        for i in range(1, k):
+            v &= b[:, i:rows - k + 1 + i, :]
+        won |= v.any(axis=(1, 2))
+    if rows >= k and cols >= k:
+        d = b[:, :rows - k + 1, :cols - k + 1].copy()
+        a = b[:, :rows - k + 1, k - 1:].copy()
+        for i in range(1, k):
+            d &= b[:, i:rows - k + 1 + i, i:cols - k + 1 + i]
+            a &= b[:, i:rows - k + 1 + i, k - 1 - i:cols - i]
+        won |= d.any(axis=(1, 2)) | a.any(axis=(1, 2))
+    return won
+
+
+class BatchGames:
+    def __init__(self, n: int, rows: int = 15, cols: int = 15,
+                 seed: int = None) -> None:
+        """
+        N games played in lock step.
+
+        Parameters
+        ----------
+        n: int
+            number of games.
+        rows, cols: int
+            board size.
+        seed: int
+            seed of the random plays, None for different games every time.
+        """
+        self.n = n
+        self.rows = rows
+        self.cols = cols
+        self.rng = np.random.default_rng(seed)
+        # the boards padded by `PAD` blanks, so the lines around a play
+        # never leave the array.
+        self.padded = np.zeros((n, rows + 2 * PAD, cols + 2 * PAD), dtype=np.int8)
+        self.boards = self.padded[:, PAD:PAD + rows, PAD:PAD + cols]
+        # games not finished.
+        self.active = np.ones(n, dtype=bool)
+        # 0 for a draw or not finished, or the enum value of the winner.
+        self.winners = np.zeros(n, dtype=np.int8)
+        # plays of every game.
+        self.steps = np.zeros(n, dtype=np.int32)
+        self.moves = np.full((n, rows * cols), -1, dtype=np.int16)
+        # a random order of the points per game, the uniform random plays 
+        # of a game are the points in this order, drawn once.
+        self.order = None
+        # the number of stones in the 3 by 3 square of every point, kept for 
+        # the guided plays.
+        self.near = np.zeros((n, rows + 2, cols + 2), dtype=np.int8)
+
+    def choose(self, games: np.ndarray, guided: float = 0.0):
+        """
+        Choose the plays of `games` (indexes), at random among the blanks.
+
+        Parameters
+        ----------
+        guided: float
+            the weight of the stones next to a blank, 0 for uniform random
+            plays. a blank with k stones around is taken as if it had
+            1 + guided * k tickets.
+
+        Returns
+        -------
+        idx: np.ndarray
+            row * cols + col of the plays.
+        """
+        if guided <= 0:
+            if self.order is None:
+                self.order = self.rng.random((self.n, self.rows * self.cols), 
+                                             dtype=np.float32).argsort(axis=1)
+            return self.order[games, self.steps[games]]
+        boards = self.boards[games].reshape(len(games), -1)
+        near = self.near[games, 1:-1, 1:-1].reshape(len(games), -1)
+        keys = self.rng.random(boards.shape, dtype=np.float32)
+        # the largest of u ** (1 / w) is drawn with weights w.
+        power = (1 / (1 + guided * np.arange(10))).astype(np.float32)
+        keys **= power[near]
+        keys[boards != 0] = -1
+        return keys.argmax(axis=1)
+
+    def won(self, games: np.ndarray, rows: np.ndarray, cols: np.ndarray,
+            values: np.ndarray):
+        """
+        Check for winning on the lines through the plays of `games`.
+
+        Returns
+        -------
+        won: np.ndarray
+            bool array of shape (len(games),).
+        """
+        r = rows[:, None, None] + PAD + DIRECTIONS[None, :, 0, None] * OFFSETS
+        c = cols[:, None, None] + PAD + DIRECTIONS[None, :, 1, None] * OFFSETS
+        lines = self.padded[games[:, None, None], r, c] == values[:, None, None]
+        # 5 in a row among the 9 cells of a line.
+        run = lines[:, :, :PAD + 1].copy()
+        for i in range(1, PIECES_IN_LINE):
+            run &= lines[:, :, i:i + PAD + 1]
+        return run.any(axis=(1, 2))
+
+    def step(self, guided: float = 0.0):
+        """Play one move in every game not finished."""
+        games = np.nonzero(self.active)[0]
+        idx = self.choose(games, guided)
+        rows, cols = np.divmod(idx, self.cols)
+        steps = self.steps[games]
+        values = np.where(steps % 2 == 0, Piece.black.value,
+                          Piece.white.value).astype(np.int8)
+        self.boards[games, rows, cols] = values
+        if guided > 0:
+            for dr in (0, 1, 2):
+                for dc in (0, 1, 2):
+                    self.near[games, rows + dr, cols + dc] += 1
+        self.moves[games, steps] = idx
+        self.steps[games] += 1
+        won = self.won(games, rows, cols, values)
+        self.winners[games[won]] = values[won]
+        full = self.steps[games] == self.rows * self.cols
+        self.active[games[won | full]] = False
+
+    def play(self, guided: float = 0.0):
+        """
+        Play all the games to the end.
+
+        Returns
+        -------
+        winners: np.ndarray
+            int8 array, 0 for a draw, or the enum value of the winner.
+        """
+        while self.active.any():
+            self.step(guided)
+        return self.winners
+
+
+def play_batch(n: int, rows: int = 15, cols: int = 15, seed: int = None,
+               guided: float = 0.0):
+    """
+    Play n random games at once, see `BatchGames`.
+
+    Returns
+    -------
+    games: BatchGames
+        the finished games, with their boards, winners, steps and moves.
+    """
+    games = BatchGames(n, rows, cols, seed)
+    games.play(guided)
+    return games
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Lock-step self-play of many games.')
+    parser.add_argument('-n', '--games', type=int, default=10000)
+    parser.add_argument('-s', '--size', type=int, default=15)
+    parser.add_argument('--guided', type=float, default=0.0,
+                        help='weight of the stones next to a blank.')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    t = time.perf_counter()
+    games = play_batch(args.games, args.size, args.size, args.seed, args.guided)
+    t = time.perf_counter() - t
+    black = int(np.sum(games.winners == Piece.black.value))
+    white = int(np.sum(games.winners == Piece.white.value))
+    print(f'{args.games} games in {t:.2f}s, {args.games / t:.0f} games/s, '
+          f'black {black}, white {white}, draws {args.games - black - white}, '
+          f'{games.steps.mean():.1f} plies per game')
@@ -0,0 +1,265 @@
+"""
+Benchmarks of the engine.
+
+The results are written as JSON, so the results of two commits can be
+compared by `--compare`. There are 3 parts:
+
+- micro: microseconds per call of `utils.check_value`, `utils.check`, the
+  `candidates` operations, `evaluation.evaluate`, and the `boardstate`
+  operations, on random boards of several sizes.
+- search: nodes per second of `Minimax` on `positions.SUITE`, and the
+  seconds of iterative deepening to finish every depth.
+- puzzles: the number of `positions.PUZZLES` solved by `Minimax` under
+  several time limits, with and without the threat-space search.
+
+usage:
+
+    python benchmark.py -o new.json
+    python benchmark.py --compare old.json new.json
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import time
+import numba
+import numpy as np
+from jitcache import njit
+from boardstate import BoardState, state_make, state_unmake
+from candidates import CandidateSet, make, unmake
+from evaluation import evaluate
+from minimax import Minimax, warm_up
+from positions import PUZZLES, SUITE, setup
+from utils import Piece, check, check_value
+
+
+@njit(cache=True)
+def check_value_loop(board: np.ndarray, points: np.ndarray):
+    """`check_value` at every point, returns the number of wins."""
+    n = 0
+    for i in range(points.shape[0]):
+        if check_value(board, board[points[i, 0], points[i, 1]],
+                       points[i, 0], points[i, 1]):
+            n += 1
+    return n
+
+
+@njit(cache=True)
+def make_unmake_loop(cands: tuple, board: np.ndarray, points: np.ndarray):
+    """`make` and `unmake` a piece at every point."""
+    for i in range(points.shape[0]):
+        row = points[i, 0]
+        col = points[i, 1]
+        board[row, col] = 1
+        p = make(cands, board, row, col)
+        unmake(cands, board, row, col, p)
+        board[row, col] = 0
+
+
+@njit(cache=True)
+def state_loop(state: tuple, points: np.ndarray):
+    """`state_make`, the win check and `state_unmake` at every point."""
+    n = 0
+    for i in range(points.shape[0]):
+        state_make(state, points[i, 0], points[i, 1], 1)
+        if state[4][1, -1] > 0:
+            n += 1
+        state_unmake(state, points[i, 0], points[i, 1])
+    return n
+
+
+@njit(cache=True)
+def evaluate_loop(board: np.ndarray, repeat: int):
+    s = 0.0
+    for i in range(repeat):
+        s += evaluate(board, 1 + i % 2)
+    return s
+
+
+def per_call(f, repeat: int):
+    """microseconds per call of f(), f makes `repeat` calls."""
+    f()
+    t = time.perf_counter()
+    f()
+    return (time.perf_counter() - t) / repeat * 1e6
+
+
+def micro(sizes=(9, 15, 19), repeat: int = 100000, seed: int = 0):
+    """
+    Returns
+    -------
+    results: list
+        {"size", "check_value", "check", "make_unmake", "build", "evaluate",
+        "state_make_unmake"} per size, in microseconds per call.
+    """
+    rng = np.random.default_rng(seed)
+    results = []
+    for size in sizes:
+        board = rng.choice(np.array([0, 1, 2], dtype=np.int8),
+                           size=(size, size), p=[0.6, 0.2, 0.2])
+        stones = np.argwhere(board != 0)
+        points = stones[rng.integers(0, len(stones), repeat)]
+        blanks = np.argwhere(board == 0)
+        empties = blanks[rng.integers(0, len(blanks), repeat)]
+        few = points[:repeat // 100]
+        cands = CandidateSet(board.size)
+        cands.build(board)
+        state = BoardState(size, size, board)
+        results.append({
+            'size': size,
+            'check_value': per_call(lambda: check_value_loop(board, points),
+                                    repeat),
+            'check': per_call(lambda: [check(board, int(board[r, c]), r, c)
+                                       for r, c in few], len(few)),
+            'make_unmake': per_call(
+                lambda: make_unmake_loop(cands.cands, board, empties), repeat),
+            'build': per_call(lambda: [cands.build(board) for _ in range(100)],
+                              100),
+            'evaluate': per_call(lambda: evaluate_loop(board, repeat // 100),
+                                 repeat // 100),
+            'state_make_unmake': per_call(
+                lambda: state_loop(state.state, empties), repeat),
+        })
+    return results
+
+
+def search(depth: int = 4):
+    """
+    Returns
+    -------
+    results: dict
+        "nodes", "seconds" and "nodes_per_second" of the searches of depth
+        `depth`, and "time_to_depth", the total seconds of the searches of
+        every depth from 1 to `depth`.
+    """
+    time_to_depth = []
+    for d in range(1, depth + 1):
+        nodes = 0
+        seconds = 0.0
+        for position in SUITE:
+            board, row, col, steps = setup(position)
+            piece = Piece.black if steps % 2 == 0 else Piece.white
+            player = Minimax('player', piece, depth=d, threats=False)
+            t = time.perf_counter()
+            player.play(board, row, col, steps)
+            seconds += time.perf_counter() - t
+            nodes += int(player.nodes)
+        time_to_depth.append(seconds)
+    return {
+        'depth': depth,
+        'nodes': nodes,
+        'seconds': seconds,
+        'nodes_per_second': nodes / seconds,
+        'time_to_depth': time_to_depth,
+    }
+
+
+def puzzles(time_limits=(0.05, 0.2, 1.0)):
+    """
+    Returns
+    -------
+    results: list
+        {"time_limit", "threats", "solved", "total", "failed"} per time limit
+        and config, "failed" are the names of the puzzles not solved.
+    """
+    results = []
+    for time_limit in time_limits:
+        for threats in (True, False):
+            failed = []
+            for puzzle in PUZZLES:
+                board, row, col, steps = setup(puzzle)
+                piece = Piece.black if steps % 2 == 0 else Piece.white
+                player = Minimax('player', piece, time_limit=time_limit,
+                                 threats=threats)
+                if player.play(board, row, col, steps) not in puzzle[3]:
+                    failed.append(puzzle[0])
+            results.append({
+                'time_limit': time_limit,
+                'threats': threats,
+                'solved': len(PUZZLES) - len(failed),
+                'total': len(PUZZLES),
+                'failed': failed,
+            })
+    return results
+
+
+def git_commit():
+    """the short hash of the commit of the source, None if unknown."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(parts=('micro', 'search', 'puzzles'), depth: int = 4):
+    """Run the parts of the benchmarks, returns the results."""
+    warm_up()
+    results = {
+        'meta': {
+            'commit': git_commit(),
+            'time': datetime.datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'numba': numba.__version__,
+            'machine': platform.machine(),
+        },
+    }
+    if 'micro' in parts:
+        results['micro'] = micro()
+    if 'search' in parts:
+        results['search'] = search(depth)
+    if 'puzzles' in parts:
+        results['puzzles'] = puzzles()
+    return results
+
+
+def flatten(results, prefix: str = ''):
+    """{path: number} of the numbers in the results."""
+    items = {}
+    if isinstance(results, dict):
+        for key, value in results.items():
+            if key != 'meta':
+                items.update(flatten(value, f'{prefix}{key}.'))
+    elif isinstance(results, list):
+        for i, value in enumerate(results):
+            items.update(flatten(value, f'{prefix}{i}.'))
+    elif isinstance(results, (int, float)) and not isinstance(results, bool):
+        items[prefix[:-1]] = results
+    return items
+
+
+def compare(old: dict, new: dict):
+    """Print the numbers of two results side by side."""
+    print(f'old: {old["meta"]["commit"]}, new: {new["meta"]["commit"]}')
+    a = flatten(old)
+    b = flatten(new)
+    for key in a:
+        if key in b:
+            ratio = b[key] / a[key] if a[key] else float('nan')
+            print(f'{key:>40} {a[key]:>14.4f} {b[key]:>14.4f} {ratio:>8.3f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the engine.')
+    parser.add_argument('-o', '--output', default='benchmark.json')
+    parser.add_argument('--parts', nargs='+', default=['micro', 'search', 'puzzles'],
+                        choices=['micro', 'search', 'puzzles'])
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'),
+                        help='compare two result files instead of running.')
+    args = parser.parse_args()
+    if args.compare:
+        with open(args.compare[0]) as f0, open(args.compare[1]) as f1:
+            compare(json.load(f0), json.load(f1))
+    else:
+        results = run(args.parts, args.depth)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+        print(json.dumps(results, indent=1))
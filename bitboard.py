@@ -0,0 +1,258 @@
+"""
+Bitboard representation of the board.
+
+Every row of the board is kept as an uint64 per player, bit `col` of
+`bits[piece, row]` is set when the piece is at (row, col), and `bits[0]` is
+the union of both players. The lines of 5 are found by shift-and of the
+rows, the rows of the diagonals are shifted by their distance to the
+checked row, so they line up with it.
+
+`Minimax(..., backend='bitboard')` uses the bitboard for the win check
+only. The candidates are not taken from `neighbors`. They stay in the
+incremental `candidates.CandidateSet`, which keeps for every blank the
+number of the stones around it, so a play is undone in O(1). A dilation
+mask has no such count and has to be rebuilt at every node. `neighbors` is
+kept for the comparison of `benchmark`.
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import time
+import numpy as np
+from jitcache import njit
+from utils import Piece, check_value
+
+# max columns of the board.
+MAX_COLS = 64
+
+ONE = np.uint64(1)
+
+
+def to_bitboard(board: np.ndarray) -> np.ndarray:
+    """
+    Create the bitboard of an ndarray board.
+
+    Returns
+    -------
+    bits: np.ndarray
+        uint64 array of shape (3, rows).
+    """
+    if board.shape[1] > MAX_COLS:
+        raise ValueError(f'bitboard supports at most {MAX_COLS} columns.')
+    bits = np.zeros((3, board.shape[0]), dtype=np.uint64)
+    weights = ONE << np.arange(board.shape[1], dtype=np.uint64)
+    for piece in (Piece.black.value, Piece.white.value):
+        bits[piece] = ((board == piece) * weights).sum(axis=1, dtype=np.uint64)
+    bits[0] = bits[1] | bits[2]
+    return bits
+
+
+@njit(cache=True)
+def set_bit(bits: np.ndarray, piece: int, row: int, col: int):
+    """Put `piece` at (row, col)."""
+    b = ONE << np.uint64(col)
+    bits[piece, row] |= b
+    bits[0, row] |= b
+
+
+@njit(cache=True)
+def clear_bit(bits: np.ndarray, piece: int, row: int, col: int):
+    """Remove `piece` from (row, col)."""
+    b = ~(ONE << np.uint64(col))
+    bits[piece, row] &= b
+    bits[0, row] &= b
+
+
+@njit(cache=True)
+def check_bits(bits: np.ndarray, value: int, row: int, col: int,
+            pieces_in_line: int = 5):
+    """
+    Check for winning, the same as `utils.check_value` on the bitboard.
+
+    Parameters
+    ----------
+    bits : np.ndarray
+        the bitboard.
+    value: int
+        check for enum value of Piece.black or Piece.white.
+    row : int
+        row of last piece.
+    col : int
+        column of last piece.
+    pieces_in_line : int
+        pieces in line that winning. default is 5.
+
+    Returns
+    -------
+    winning : bool
+        True, the player won and the game over;
+        False, the player not won and the game continue.
+    """
+    n = pieces_in_line - 1
+    # horizon
+    x = bits[value, row]
+    line = x
+    for k in range(1, n + 1):
+        line &= x >> np.uint64(k)
+    # start of the line in [col - n, col]
+    lo = max(0, col - n)
+    if (line >> np.uint64(lo)) & ((ONE << np.uint64(col - lo + 1)) - ONE):
+        return True
+    rows = bits.shape[1]
+    for start in range(max(0, row - n), min(row, rows - 1 - n) + 1):
+        vertical = bits[value, start]
+        diagonal = bits[value, start]
+        antidiagonal = bits[value, start]
+        for k in range(1, n + 1):
+            x = bits[value, start + k]
+            vertical &= x
+            # LU->RD, (start + k, c0 + k) is moved to c0.
+            diagonal &= x >> np.uint64(k)
+            # LD->RU, (start + k, c0 - k) is moved to c0.
+            antidiagonal &= x << np.uint64(k)
+        if (vertical >> np.uint64(col)) & ONE:
+            return True
+        c0 = col - (row - start)
+        if c0 >= 0 and (diagonal >> np.uint64(c0)) & ONE:
+            return True
+        c0 = col + (row - start)
+        if c0 < MAX_COLS and (antidiagonal >> np.uint64(c0)) & ONE:
+            return True
+    return False
+
+
+@njit(cache=True)
+def neighbors(bits: np.ndarray, cols: int, span: int = 1):
+    """
+    Blank cells within `span` of any piece, by shift-or dilation.
+
+    Returns
+    -------
+    mask: np.ndarray
+        uint64 array of shape (rows,), one bit for one cell.
+    """
+    rows = bits.shape[1]
+    full = (ONE << np.uint64(cols)) - ONE if cols < MAX_COLS else ~np.uint64(0)
+    # dilate every row horizontally.
+    wide = np.zeros(rows, dtype=np.uint64)
+    for row in range(rows):
+        x = bits[0, row]
+        w = x
+        for k in range(1, span + 1):
+            w |= (x << np.uint64(k)) | (x >> np.uint64(k))
+        wide[row] = w
+    # then vertically.
+    mask = np.zeros(rows, dtype=np.uint64)
+    for row in range(rows):
+        m = np.uint64(0)
+        for r in range(max(0, row - span), min(rows, row + span + 1)):
+            m |= wide[r]
+        mask[row] = m & full & ~bits[0, row]
+    return mask
+
+
+@njit(cache=True)
+def mask_indexes(mask: np.ndarray, cols: int):
+    """indexes (row * cols + col) of the bits set in the mask."""
+    n = 0
+    for row in range(mask.shape[0]):
+        x = mask[row]
+        while x:
+            x &= x - ONE
+            n += 1
+    indexes = np.empty(n, dtype=np.int64)
+    i = 0
+    for row in range(mask.shape[0]):
+        for col in range(cols):
+            if (mask[row] >> np.uint64(col)) & ONE:
+                indexes[i] = row * cols + col
+                i += 1
+    return indexes
+
+
+@njit(cache=True)
+def array_neighbors(board: np.ndarray, span: int = 1):
+    """`neighbors` on the ndarray board, for comparing."""
+    mask = np.zeros(board.shape, dtype=np.bool_)
+    for row in range(board.shape[0]):
+        for col in range(board.shape[1]):
+            if board[row, col] == 0:
+                continue
+            for r in range(max(0, row - span), min(board.shape[0], row + span + 1)):
+                for c in range(max(0, col - span), min(board.shape[1], col + span + 1)):
+                    if board[r, c] == 0:
+                        mask[r, c] = True
+    return mask
+
+
+@njit(cache=True)
+def array_checks(board: np.ndarray, points: np.ndarray):
+    """`check_value` for every point, returns the number of wins."""
+    n = 0
+    for i in range(points.shape[0]):
+        if check_value(board, 1, points[i, 0], points[i, 1]):
+            n += 1
+    return n
+
+
+@njit(cache=True)
+def bits_checks(bits: np.ndarray, points: np.ndarray):
+    """`check_bits` for every point, returns the number of wins."""
+    n = 0
+    for i in range(points.shape[0]):
+        if check_bits(bits, 1, points[i, 0], points[i, 1]):
+            n += 1
+    return n
+
+
+def benchmark(sizes=(15, 19, 64), repeat: int = 100000, seed: int = 0):
+    """
+    Compare the bitboard with the ndarray board.
+
+    Prints the time in microseconds of a win check, of finding the
+    neighbors, and of a `Minimax` play of depth 3 on the board of 19x19.
+    """
+    from minimax import Minimax
+    rng = np.random.default_rng(seed)
+    print(f'{"size":>6} {"check_value":>12} {"check_bits":>12} '
+          f'{"array_neighbors":>16} {"neighbors":>12}')
+    for n in sizes:
+        board = rng.choice(np.array([0, 1, 2], dtype=np.int32), size=(n, n),
+                           p=[0.6, 0.2, 0.2])
+        bits = to_bitboard(board)
+        points = rng.integers(0, n, size=(repeat, 2))
+        results = []
+        for f, b in ((array_checks, board), (bits_checks, bits)):
+            # compile first.
+            f(b, points[:1])
+            t = time.perf_counter()
+            f(b, points)
+            results.append((time.perf_counter() - t) / repeat * 1e6)
+        for f, args in ((array_neighbors, (board,)), (neighbors, (bits, n))):
+            f(*args)
+            t = time.perf_counter()
+            for _ in range(1000):
+                f(*args)
+            results.append((time.perf_counter() - t) / 1000 * 1e6)
+        print(f'{n:>6} {results[0]:>12.3f} {results[1]:>12.3f} '
+              f'{results[2]:>16.3f} {results[3]:>12.3f}')
+
+    for backend in ('ndarray', 'bitboard'):
+        for k in range(2):
+            # the first round is for compiling.
+            board = np.zeros((19, 19), dtype=np.int32)
+            players = [Minimax('black', Piece.black, depth=3, backend=backend), 
+                       Minimax('white', Piece.white, depth=3, backend=backend)]
+            row, col = -1, -1
+            nodes = 0
+            t = time.perf_counter()
+            for steps in range(12):
+                player = players[steps % 2]
+                row, col = player.play(board, row, col, steps)
+                nodes += player.nodes
+            t = time.perf_counter() - t
+        print(f'Minimax {backend:>9}: {t / 12 * 1e6:.0f} us per play, '
+              f'{nodes / t:.0f} nodes/s')
+
+
+if __name__ == '__main__':
+    benchmark()
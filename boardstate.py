@@ -0,0 +1,223 @@
+"""
+Board with incremental line patterns.
+
+`BoardState` keeps, for every stone and each of the 4 directions, the
+pattern type of its window (see `evaluation.py`), the length of its run of
+stones and the open ends of the run within the window. A play only changes
+the windows of the stones within 4 cells on its 4 lines, so `make` and
+`unmake` update at most 4 * 9 windows, and keep:
+
+- the number of blanks, for the draw;
+- the number of (stone, direction) of every pattern type per player, for
+  the win (a FIVE) and the threats;
+- the pattern score per player, so `evaluate` gives the same result as
+  `evaluation.evaluate` without scanning the board.
+
+The state is a tuple of arrays passed to the njit functions, like
+`candidates.CandidateSet`:
+
+- board: int8 (rows, cols).
+- types, runs, opens: int8 (rows, cols, 4), 0 on the blanks.
+- counts: int64 (3, number of types), counts[value, type].
+- scores: float64 (3,), the sum of the pattern scores per player.
+- empty: int64 (1,), the number of blanks.
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import numpy as np
+from jitcache import njit
+from evaluation import (CENTER, DIRECTIONS, FIVE, FOUR, LIVE_FOUR, LIVE_THREE,
+                        OPPONENT_WEIGHT, PATTERN_SCORES, PATTERN_TYPE,
+                        window_code)
+
+NUM_TYPES = FIVE + 1
+
+
+@njit(cache=True)
+def run_of(board: np.ndarray, row: int, col: int, dr: int, dc: int):
+    """
+    The run of the stone at (row, col) in direction (dr, dc), within the
+    window of 9 cells.
+
+    Returns
+    -------
+    length, opens: the stones of the run, and the blanks at its 2 ends.
+    """
+    value = board[row, col]
+    length = 1
+    opens = 0
+    for side in (-1, 1):
+        for k in range(1, CENTER + 1):
+            r = row + side * k * dr
+            c = col + side * k * dc
+            if r < 0 or r >= board.shape[0] or c < 0 or c >= board.shape[1]:
+                break
+            if board[r, c] == value:
+                length += 1
+                continue
+            if board[r, c] == 0:
+                opens += 1
+            break
+    return length, opens
+
+
+@njit(cache=True)
+def forget(state: tuple, row: int, col: int, d: int):
+    """Remove the pattern of the stone at (row, col) in direction d."""
+    board, types, runs, opens, counts, scores, empty = state
+    value = board[row, col]
+    t = types[row, col, d]
+    counts[value, t] -= 1
+    scores[value] -= PATTERN_SCORES[t]
+    types[row, col, d] = 0
+    runs[row, col, d] = 0
+    opens[row, col, d] = 0
+
+
+@njit(cache=True)
+def learn(state: tuple, row: int, col: int, d: int):
+    """Compute the pattern of the stone at (row, col) in direction d."""
+    board, types, runs, opens, counts, scores, empty = state
+    value = board[row, col]
+    dr = DIRECTIONS[d, 0]
+    dc = DIRECTIONS[d, 1]
+    t = PATTERN_TYPE[window_code(board, value, row, col, dr, dc)]
+    length, ends = run_of(board, row, col, dr, dc)
+    types[row, col, d] = t
+    runs[row, col, d] = length
+    opens[row, col, d] = ends
+    counts[value, t] += 1
+    scores[value] += PATTERN_SCORES[t]
+
+
+@njit(cache=True)
+def update(state: tuple, row: int, col: int, value: int):
+    """
+    Put `value` at (row, col), 0 to take the stone away, and update the
+    windows of the stones within 4 cells on the 4 lines.
+    """
+    board = state[0]
+    for d in range(4):
+        dr = DIRECTIONS[d, 0]
+        dc = DIRECTIONS[d, 1]
+        for k in range(-CENTER, CENTER + 1):
+            r = row + k * dr
+            c = col + k * dc
+            if 0 <= r < board.shape[0] and 0 <= c < board.shape[1] and \
+                    board[r, c] != 0:
+                forget(state, r, c, d)
+    board[row, col] = value
+    for d in range(4):
+        dr = DIRECTIONS[d, 0]
+        dc = DIRECTIONS[d, 1]
+        for k in range(-CENTER, CENTER + 1):
+            r = row + k * dr
+            c = col + k * dc
+            if 0 <= r < board.shape[0] and 0 <= c < board.shape[1] and \
+                    board[r, c] != 0:
+                learn(state, r, c, d)
+
+
+@njit(cache=True)
+def state_make(state: tuple, row: int, col: int, value: int):
+    """Put a stone of `value` on the blank (row, col)."""
+    update(state, row, col, value)
+    state[6][0] -= 1
+
+
+@njit(cache=True)
+def state_unmake(state: tuple, row: int, col: int):
+    """Take the stone at (row, col) away."""
+    update(state, row, col, 0)
+    state[6][0] += 1
+
+
+@njit(cache=True)
+def state_build(state: tuple, board: np.ndarray):
+    """Fill the state by the stones of `board`."""
+    cells, types, runs, opens, counts, scores, empty = state
+    cells[:, :] = 0
+    types[:, :, :] = 0
+    runs[:, :, :] = 0
+    opens[:, :, :] = 0
+    counts[:, :] = 0
+    scores[:] = 0.0
+    empty[0] = board.size
+    for row in range(board.shape[0]):
+        for col in range(board.shape[1]):
+            if board[row, col] != 0:
+                state_make(state, row, col, board[row, col])
+
+
+class BoardState:
+    def __init__(self, rows: int, cols: int, board: np.ndarray = None) -> None:
+        """
+        Board with incremental line patterns.
+
+        Parameters
+        ----------
+        rows, cols: int
+            board size.
+        board: np.ndarray
+            the stones to start with, None for an empty board.
+        """
+        self.state = (np.zeros((rows, cols), dtype=np.int8),
+                      np.zeros((rows, cols, 4), dtype=np.int8),
+                      np.zeros((rows, cols, 4), dtype=np.int8),
+                      np.zeros((rows, cols, 4), dtype=np.int8),
+                      np.zeros((3, NUM_TYPES), dtype=np.int64),
+                      np.zeros(3, dtype=np.float64),
+                      np.full(1, rows * cols, dtype=np.int64))
+        if board is not None:
+            self.build(board)
+
+    @property
+    def board(self):
+        return self.state[0]
+
+    @property
+    def empty(self):
+        """number of blanks."""
+        return int(self.state[6][0])
+
+    def build(self, board: np.ndarray):
+        state_build(self.state, board.astype(np.int8))
+
+    def make(self, row: int, col: int, value: int):
+        state_make(self.state, row, col, value)
+
+    def unmake(self, row: int, col: int):
+        state_unmake(self.state, row, col)
+
+    def won(self, value: int):
+        """True if the player of `value` has a five."""
+        return self.state[4][value, FIVE] > 0
+
+    def full(self):
+        """True if there is no blank, a draw when no one won."""
+        return self.state[6][0] == 0
+
+    def threats(self, value: int):
+        """
+        Threats of the player of `value`, counted per stone and direction.
+
+        Returns
+        -------
+        fours, live_threes: int
+            the (stone, direction) of a four or live four, and of a live
+            three.
+        """
+        counts = self.state[4][value]
+        return int(counts[FOUR] + counts[LIVE_FOUR]), int(counts[LIVE_THREE])
+
+    def run(self, row: int, col: int, d: int):
+        """
+        (length, open ends) of the run of the stone at (row, col) in
+        direction d (see `evaluation.DIRECTIONS`), within 4 cells.
+        """
+        return int(self.state[2][row, col, d]), int(self.state[3][row, col, d])
+
+    def evaluate(self, value: int):
+        """The same as `evaluation.evaluate(board, value)`."""
+        scores = self.state[5]
+        return scores[value] - OPPONENT_WEIGHT * scores[3 - value]
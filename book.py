@@ -0,0 +1,301 @@
+"""
+Opening book.
+
+The book maps a position to the plays made from it in former games, with
+the number of games and the score of the player who made the play (1 for a
+win, 0.5 for a draw). A position is keyed by the smallest Zobrist hash of
+its 8 symmetries (4 on a board that is not square), and the play is saved
+in the same symmetry, so the book answers for every rotated or mirrored
+position too.
+
+The book file is a header and the entries sorted by (key, move):
+
+    magic 'GOBOOK01', rows u4, cols u4, entries u8
+    key u8, move i4, count u4, score f4, padding u4
+
+It is opened with np.memmap, so opening costs nothing and a lookup reads
+O(log n) pages by np.searchsorted.
+
+usage:
+
+    python book.py build book.bin arena.jsonl [more.jsonl games.rec ...]
+    python book.py selfplay book.bin -n 100 --agent minimax:depth=4
+    python book.py show book.bin
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import argparse
+import json
+import os
+import numpy as np
+from gamerecord import is_record_file, read_records
+from transposition import zobrist_keys
+
+MAGIC = b'GOBOOK01'
+HEADER = np.dtype([('magic', 'S8'), ('rows', '<u4'), ('cols', '<u4'),
+                   ('entries', '<u8')])
+ENTRY = np.dtype([('key', '<u8'), ('move', '<i4'), ('count', '<u4'),
+                  ('score', '<f4'), ('padding', '<u4')])
+# seed of the Zobrist keys of the book, changing it makes the books invalid.
+BOOK_SEED = 20220601
+# plays of a game saved to the book.
+MAX_PLIES = 10
+# symmetries that keep the board the same when it is not square.
+RECT_SYMMETRIES = (0, 2, 4, 5)
+# symmetry that undoes symmetry t.
+INVERSE = (0, 3, 2, 1, 4, 5, 6, 7)
+
+
+def transform(row, col, t: int, rows: int, cols: int):
+    """
+    Map (row, col) by symmetry `t`: 0 identity, 1-3 rotations of 90, 180,
+    270 degrees, 4 and 5 the mirrors, 6 and 7 the transposes.
+    row and col can be arrays.
+    """
+    r1 = rows - 1 - row
+    c1 = cols - 1 - col
+    return [(row, col), (col, r1), (r1, c1), (c1, row),
+            (row, c1), (r1, col), (col, row), (c1, r1)][t]
+
+
+def symmetries(rows: int, cols: int):
+    """the symmetries of a board of rows by cols."""
+    return range(8) if rows == cols else RECT_SYMMETRIES
+
+
+def canonical(board: np.ndarray, keys: np.ndarray):
+    """
+    Canonical hash of the board.
+
+    Returns
+    -------
+    key: int
+        the smallest hash of the symmetries of the board.
+    t: int
+        the symmetry of the smallest hash, `transform(..., t, ...)` maps the
+        plays on `board` to the plays saved in the book.
+    """
+    rows, cols = board.shape
+    stones_row, stones_col = np.nonzero(board)
+    pieces = board[stones_row, stones_col].astype(np.int64)
+    best = None
+    for t in symmetries(rows, cols):
+        r, c = transform(stones_row, stones_col, t, rows, cols)
+        h = int(np.bitwise_xor.reduce(keys[pieces, r * cols + c],
+                                      initial=np.uint64(0)))
+        if best is None or h < best[0]:
+            best = h, t
+    return best
+
+
+class OpeningBook:
+    def __init__(self, path: str) -> None:
+        """
+        Open the book file.
+
+        Parameters
+        ----------
+        path: str
+            the book file written by `write_book`.
+        """
+        header = np.fromfile(path, dtype=HEADER, count=1)
+        if header.shape[0] != 1 or header['magic'][0] != MAGIC:
+            raise ValueError(f'not a book file: {path}')
+        self.rows = int(header['rows'][0])
+        self.cols = int(header['cols'][0])
+        n = int(header['entries'][0])
+        if n > 0:
+            self.entries = np.memmap(path, dtype=ENTRY, mode='r',
+                                     offset=HEADER.itemsize, shape=(n,))
+        else:
+            self.entries = np.zeros(0, dtype=ENTRY)
+        self.keys = zobrist_keys(self.rows, self.cols, BOOK_SEED)
+
+    def __len__(self):
+        return self.entries.shape[0]
+
+    def moves(self, board: np.ndarray):
+        """
+        Plays of the board in the book.
+
+        Returns
+        -------
+        moves: list
+            (row, col, count, score) of the plays on `board`, score is the
+            mean score of the player who made the play.
+        """
+        if board.shape != (self.rows, self.cols) or len(self) == 0:
+            return []
+        key, t = canonical(board, self.keys)
+        keys = self.entries['key']
+        lo = np.searchsorted(keys, np.uint64(key), 'left')
+        hi = np.searchsorted(keys, np.uint64(key), 'right')
+        moves = []
+        for e in self.entries[lo:hi]:
+            row, col = divmod(int(e['move']), self.cols)
+            row, col = transform(row, col, INVERSE[t], self.rows, self.cols)
+            moves.append((row, col, int(e['count']),
+                          float(e['score']) / int(e['count'])))
+        return moves
+
+    def probe(self, board: np.ndarray, min_count: int = 2):
+        """
+        The best play of the board in the book.
+
+        Returns
+        -------
+        pos: tuple_of_int or None
+            (row, col) of the play with the best score among the plays made
+            in `min_count` games or more, None if there is none.
+        """
+        best = None
+        for row, col, count, score in self.moves(board):
+            if count < min_count or board[row, col] != 0:
+                continue
+            if best is None or (score, count) > best[0]:
+                best = (score, count), (row, col)
+        return None if best is None else best[1]
+
+
+def game_entries(moves: list, winner, rows: int, cols: int, keys: np.ndarray,
+                max_plies: int = MAX_PLIES):
+    """
+    Book entries of a game.
+
+    Parameters
+    ----------
+    moves: list
+        (row, col, seconds) of the plays, black first. plays of 0 seconds are
+        the random opening plays, they are played but not saved.
+    winner: str or None
+        'black', 'white' or None for a draw.
+
+    Yields
+    ------
+    key, move, score: the canonical hash of the position, the play in the
+        same symmetry, and the score of the player.
+    """
+    board = np.zeros((rows, cols), dtype=np.int8)
+    for ply, (row, col, seconds) in enumerate(moves[:max_plies]):
+        colour = 'black' if ply % 2 == 0 else 'white'
+        if seconds > 0:
+            key, t = canonical(board, keys)
+            r, c = transform(row, col, t, rows, cols)
+            score = 0.5 if winner is None else float(winner == colour)
+            yield key, r * cols + c, score
+        board[row, col] = 1 + ply % 2
+
+
+def write_book(path: str, rows: int, cols: int, stats: dict):
+    """
+    Write the book file.
+
+    Parameters
+    ----------
+    stats: dict
+        {(key, move): [count, score]}.
+    """
+    entries = np.zeros(len(stats), dtype=ENTRY)
+    for i, ((key, move), (count, score)) in enumerate(sorted(stats.items())):
+        entries[i] = (key, move, count, score, 0)
+    header = np.array([(MAGIC, rows, cols, len(entries))], dtype=HEADER)
+    # replace the file at once, it may be mapped by a running agent.
+    with open(path + '.tmp', 'wb') as f:
+        f.write(header.tobytes())
+        f.write(entries.tobytes())
+    os.replace(path + '.tmp', path)
+
+
+def log_records(logs: list):
+    """
+    The games of the JSON lines files and the record files, moves are 
+    (row, col, seconds).
+    """
+    for log in logs:
+        if is_record_file(log):
+            for record in read_records(log):
+                # seconds are not recorded, 0 marks the opening plays.
+                record['moves'] = [(row, col, float(i >= record['opening']))
+                                   for i, (row, col) in enumerate(record['moves'])]
+                yield record
+        else:
+            with open(log) as f:
+                for line in f:
+                    yield json.loads(line)
+
+
+def build(path: str, logs: list, size: int = 15, max_plies: int = MAX_PLIES):
+    """
+    Build or extend the book from the JSON lines files of `arena.py`, or 
+    the binary record files of `gamerecord.py`.
+
+    The games in the book file already, if it exists, are kept.
+
+    Returns
+    -------
+    games: int
+        number of games added.
+    """
+    stats = {}
+    if os.path.exists(path):
+        book = OpeningBook(path)
+        size = book.rows
+        for e in np.array(book.entries):
+            stats[int(e['key']), int(e['move'])] = [int(e['count']),
+                                                    float(e['score'])]
+        del book
+    keys = zobrist_keys(size, size, BOOK_SEED)
+    games = 0
+    for record in log_records(logs):
+        for key, move, score in game_entries(
+                record['moves'], record['winner'], size, size, keys,
+                max_plies):
+            entry = stats.setdefault((key, move), [0, 0.0])
+            entry[0] += 1
+            entry[1] += score
+        games += 1
+    write_book(path, size, size, stats)
+    return games
+
+
+def show(path: str, limit: int = 20):
+    """Print the most played entries of the book."""
+    book = OpeningBook(path)
+    print(f'{path}: {book.rows}x{book.cols}, {len(book)} entries')
+    entries = np.array(book.entries)
+    for e in entries[np.argsort(-entries['count'], kind='stable')][:limit]:
+        row, col = divmod(int(e['move']), book.cols)
+        print(f'{int(e["key"]):>20} ({row:>2}, {col:>2}) '
+              f'{int(e["count"]):>6} {e["score"] / e["count"]:>6.2f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the opening book.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    p = commands.add_parser('build', help='build or extend the book from arena logs.')
+    p.add_argument('book')
+    p.add_argument('logs', nargs='+')
+    p.add_argument('-s', '--size', type=int, default=15)
+    p.add_argument('--plies', type=int, default=MAX_PLIES)
+    p = commands.add_parser('selfplay', help='play games by arena.py and add them to the book.')
+    p.add_argument('book')
+    p.add_argument('-n', '--games', type=int, default=100)
+    p.add_argument('-s', '--size', type=int, default=15)
+    p.add_argument('--agent', default='minimax:depth=4')
+    p.add_argument('--opening', type=int, default=2)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('-j', '--workers', type=int, default=os.cpu_count())
+    p.add_argument('--plies', type=int, default=MAX_PLIES)
+    p = commands.add_parser('show', help='print the book.')
+    p.add_argument('book')
+    args = parser.parse_args()
+    if args.command == 'build':
+        print(f'{build(args.book, args.logs, args.size, args.plies)} games added.')
+    elif args.command == 'selfplay':
+        import arena
+        log = args.book + '.jsonl'
+        arena.run((args.agent, args.agent), args.games, args.size,
+                  args.opening, args.seed, args.workers, log)
+        print(f'{build(args.book, [log], args.size, args.plies)} games added.')
+    else:
+        show(args.book)
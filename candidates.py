@@ -0,0 +1,152 @@
+"""
+Set of the candidate places of the next play.
+
+The candidates are the blank cells within `span` of any piece. The set is
+kept in 4 int32 arrays, passed to the njit functions as a tuple:
+
+- count: number of pieces within `span` of the cell, the piece on the cell
+  itself is counted too.
+- pos: position of the cell in `dense`, -1 if the cell is not in the set.
+- dense: the cells in the set, `dense[:size[0]]`.
+- size: array of one element, the number of cells in the set.
+
+Add, remove and membership are O(1), and `unmake` restores the exact order
+of `dense` that was before `make`, so the search can loop over the set
+while plays are made and unmade below.
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import numpy as np
+from jitcache import njit
+
+SPAN = 1
+
+
+@njit(cache=True)
+def cand_add(cands: tuple, idx: int):
+    """Append `idx` to the set."""
+    count, pos, dense, size = cands
+    pos[idx] = size[0]
+    dense[size[0]] = idx
+    size[0] += 1
+
+
+@njit(cache=True)
+def cand_remove(cands: tuple, idx: int):
+    """
+    Remove `idx` from the set, the last cell is moved to its position.
+
+    Returns
+    -------
+    p: int
+        the position of `idx` before removing.
+    """
+    count, pos, dense, size = cands
+    p = pos[idx]
+    last = dense[size[0] - 1]
+    dense[p] = last
+    pos[last] = p
+    pos[idx] = -1
+    size[0] -= 1
+    return p
+
+
+@njit(cache=True)
+def make(cands: tuple, board: np.ndarray, row: int, col: int, span: int = SPAN):
+    """
+    Update the set after a piece is put at (row, col).
+
+    Returns
+    -------
+    p: int
+        the position of (row, col) in the set before, -1 if it was not in.
+        pass it to `unmake`.
+    """
+    count, pos, dense, size = cands
+    cols = board.shape[1]
+    idx = row * cols + col
+    p = pos[idx]
+    if p >= 0:
+        cand_remove(cands, idx)
+    for r in range(max(0, row - span), min(board.shape[0], row + span + 1)):
+        for c in range(max(0, col - span), min(cols, col + span + 1)):
+            n = r * cols + c
+            count[n] += 1
+            if count[n] == 1 and n != idx and board[r, c] == 0:
+                cand_add(cands, n)
+    return p
+
+
+@njit(cache=True)
+def unmake(cands: tuple, board: np.ndarray, row: int, col: int, p: int,
+        span: int = SPAN):
+    """Undo `make` of (row, col), `p` is the value returned by `make`."""
+    count, pos, dense, size = cands
+    cols = board.shape[1]
+    idx = row * cols + col
+    # the cells added by `make` are at the end, remove them in reverse order.
+    for r in range(min(board.shape[0], row + span + 1) - 1, max(0, row - span) - 1, -1):
+        for c in range(min(cols, col + span + 1) - 1, max(0, col - span) - 1, -1):
+            n = r * cols + c
+            count[n] -= 1
+            if count[n] == 0 and n != idx:
+                pos[n] = -1
+                size[0] -= 1
+    if p >= 0:
+        # move the cell at p back to the end, and put idx at p.
+        if p < size[0]:
+            moved = dense[p]
+            dense[size[0]] = moved
+            pos[moved] = size[0]
+        dense[p] = idx
+        pos[idx] = p
+        size[0] += 1
+
+
+@njit(cache=True)
+def build(cands: tuple, board: np.ndarray, span: int = SPAN):
+    """Fill the set by all the pieces on the board."""
+    count, pos, dense, size = cands
+    count[:] = 0
+    pos[:] = -1
+    size[0] = 0
+    for row in range(board.shape[0]):
+        for col in range(board.shape[1]):
+            if board[row, col] != 0:
+                make(cands, board, row, col, span)
+
+
+class CandidateSet:
+    def __init__(self, cells: int) -> None:
+        """
+        Set of the candidate places of the next play.
+
+        Parameters
+        ----------
+        cells: int
+            number of cells of the board.
+        """
+        self.cands = (np.zeros(cells, dtype=np.int32),
+                      np.full(cells, -1, dtype=np.int32),
+                      np.zeros(cells, dtype=np.int32),
+                      np.zeros(1, dtype=np.int32))
+
+    def __len__(self):
+        return int(self.cands[3][0])
+
+    def __contains__(self, idx: int):
+        return self.cands[1][idx] >= 0
+
+    @property
+    def indexes(self) -> np.ndarray:
+        """the candidate indexes (row * cols + col)."""
+        return self.cands[2][:len(self)].copy()
+
+    def build(self, board: np.ndarray):
+        build(self.cands, board)
+
+    def make(self, board: np.ndarray, row: int, col: int):
+        return make(self.cands, board, row, col)
+
+    def unmake(self, board: np.ndarray, row: int, col: int, p: int):
+        unmake(self.cands, board, row, col, p)
@@ -0,0 +1,228 @@
+"""
+Static evaluation of the board with pattern tables.
+
+Every stone is looked at along the 4 directions through a window of 9 cells
+centered on it. The window is encoded as an integer in base 3 (0 for blank,
+1 for the stone of the same player, 2 for the stone of the opponent or out
+of the board), and the code is mapped to the pattern type by a table built
+at import.
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import os
+import numpy as np
+from jitcache import njit
+
+# cells of the window, the stone is at the center.
+WINDOW = 9
+CENTER = WINDOW // 2
+NUM_CODES = 3 ** WINDOW
+
+# cell values in the window.
+BLANK = 0
+OWN = 1
+BLOCKED = 2
+
+# pattern types, from bad to good.
+NONE = 0        # no five can be made through the stone.
+ONE = 1
+TWO = 2
+LIVE_TWO = 3
+THREE = 4       # becomes a four by one more stone.
+LIVE_THREE = 5  # becomes a live four by one more stone.
+FOUR = 6        # becomes a five by one more stone.
+LIVE_FOUR = 7   # becomes a five in two blanks, the opponent can't stop it.
+FIVE = 8
+
+# score of the pattern types.
+PATTERN_SCORES = np.array([0, 1, 10, 100, 100, 1000, 1000, 10000, 100000],
+                          dtype=np.float64)
+# the evaluation is done after a play, when the opponent is to play. the
+# threats of the opponent are more urgent, so they weigh more.
+OPPONENT_WEIGHT = 2.0
+
+# (row, col) step of the 4 directions: horizon, vertical, LU->RD, LD->RU.
+DIRECTIONS = np.array([[0, 1], [1, 0], [1, 1], [-1, 1]], dtype=np.int64)
+
+
+@njit
+def win_blanks(cells: np.ndarray):
+    """number of blanks that make a five through the center."""
+    n = 0
+    for i in range(WINDOW):
+        if cells[i] != BLANK:
+            continue
+        cells[i] = OWN
+        for start in range(max(0, CENTER - 4), min(CENTER, WINDOW - 5) + 1):
+            if start <= i < start + 5:
+                five = True
+                for k in range(start, start + 5):
+                    if cells[k] != OWN:
+                        five = False
+                        break
+                if five:
+                    n += 1
+                    break
+        cells[i] = BLANK
+    return n
+
+
+@njit
+def classify(cells: np.ndarray, level: int):
+    """
+    Pattern type of the window `cells`, the center must be `OWN`.
+
+    level: number of stones can be added to find threes and twos.
+    """
+    for start in range(max(0, CENTER - 4), min(CENTER, WINDOW - 5) + 1):
+        five = True
+        for k in range(start, start + 5):
+            if cells[k] != OWN:
+                five = False
+                break
+        if five:
+            return FIVE
+    n = win_blanks(cells)
+    if n >= 2:
+        return LIVE_FOUR
+    elif n == 1:
+        return FOUR
+    best = NONE
+    if level > 0:
+        for i in range(WINDOW):
+            if cells[i] != BLANK:
+                continue
+            cells[i] = OWN
+            t = classify(cells, level - 1)
+            cells[i] = BLANK
+            if t == LIVE_FOUR:
+                t = LIVE_THREE
+            elif t == FOUR:
+                t = THREE
+            elif t == LIVE_THREE:
+                t = LIVE_TWO
+            elif t == THREE:
+                t = TWO
+            else:
+                t = NONE
+            if t > best:
+                best = t
+    if best == NONE:
+        # one, if there is room for a five.
+        for start in range(max(0, CENTER - 4), min(CENTER, WINDOW - 5) + 1):
+            free = True
+            for k in range(start, start + 5):
+                if cells[k] == BLOCKED:
+                    free = False
+                    break
+            if free:
+                return ONE
+    return best
+
+
+@njit
+def pattern_table():
+    """
+    Build the table mapping the window code to the pattern type.
+
+    Codes whose center is not `OWN` are mapped to `NONE`.
+    """
+    table = np.zeros(NUM_CODES, dtype=np.int8)
+    cells = np.zeros(WINDOW, dtype=np.int64)
+    for code in range(NUM_CODES):
+        c = code
+        for i in range(WINDOW):
+            cells[i] = c % 3
+            c //= 3
+        if cells[CENTER] == OWN:
+            table[code] = classify(cells, 3)
+    return table
+
+
+def load_pattern_table():
+    """
+    Load the table saved by the former run, or build and save it.
+
+    The table is saved in `__pycache__`, and built again when this file is 
+    newer than it.
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 
+                        '__pycache__', 'pattern_type.npy')
+    try:
+        if os.path.getmtime(path) >= os.path.getmtime(__file__):
+            table = np.load(path)
+            if table.shape == (NUM_CODES,) and table.dtype == np.int8:
+                return table
+    except (OSError, ValueError):
+        pass
+    table = pattern_table()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.save(path, table)
+    except OSError:
+        pass
+    return table
+
+
+PATTERN_TYPE = load_pattern_table()
+
+
+@njit(cache=True)
+def window_code(board: np.ndarray, value: int, row: int, col: int,
+                dr: int, dc: int):
+    """
+    Code of the window centered on (row, col) in direction (dr, dc), seen
+    by the player of `value`.
+    """
+    code = 0
+    base = 1
+    for k in range(-CENTER, CENTER + 1):
+        r = row + k * dr
+        c = col + k * dc
+        if r < 0 or r >= board.shape[0] or c < 0 or c >= board.shape[1]:
+            code += BLOCKED * base
+        else:
+            p = board[r, c]
+            if p == value:
+                code += OWN * base
+            elif p != 0:
+                code += BLOCKED * base
+        base *= 3
+    return code
+
+
+@njit(cache=True)
+def evaluate(board: np.ndarray, value: int):
+    """
+    Evaluate the board after the player of `value` played.
+
+    Parameters
+    ----------
+    board : np.ndarray
+        the game board.
+    value: int
+        enum value of Piece.black or Piece.white.
+
+    Returns
+    -------
+    score: float
+        the sum of the pattern scores of the player minus the weighted sum
+        of its opponent.
+    """
+    own = 0.0
+    opponent = 0.0
+    for row in range(board.shape[0]):
+        for col in range(board.shape[1]):
+            p = board[row, col]
+            if p == 0:
+                continue
+            s = 0.0
+            for d in range(4):
+                code = window_code(board, p, row, col,
+                                   DIRECTIONS[d, 0], DIRECTIONS[d, 1])
+                s += PATTERN_SCORES[PATTERN_TYPE[code]]
+            if p == value:
+                own += s
+            else:
+                opponent += s
+    return own - OPPONENT_WEIGHT * opponent
@@ -0,0 +1,227 @@
+"""
+Compact binary game records.
+
+A record file is the magic 'GOREC001' and the games one after another:
+
+    rows u1, cols u1, winner u1, opening u1, plies u2,
+    black name length u1, white name length u1,
+    black name, white name (utf-8),
+    plies moves, row * cols + col of every play, black first.
+
+`winner` is 0 for a draw, 1 for black and 2 for white (the enum values of
+`Piece`), `opening` is the number of the random opening plays at the start.
+A move is 1 byte when the board has 256 points or less, 2 bytes (little
+endian) otherwise, so a game of 15 by 15 takes about 60 bytes.
+
+So the boards are up to 255 by 255, with up to 65535 plies and 255
+opening plays, `encode` raises ValueError for a game out of these bounds.
+The games of a `sparse.SparseBoard` are not recordable, its places may be
+negative or unbounded.
+
+`RecordWriter` appends a game by one unbuffered write, so processes can
+append to the same file, and a crash leaves at most the last game cut,
+which `read_records` skips.
+
+usage:
+
+    python gamerecord.py show games.rec
+    python gamerecord.py replay games.rec 3
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import argparse
+import os
+import time
+import numpy as np
+
+MAGIC = b'GOREC001'
+HEADER = np.dtype([('rows', 'u1'), ('cols', 'u1'), ('winner', 'u1'),
+                   ('opening', 'u1'), ('plies', '<u2'), ('black', 'u1'),
+                   ('white', 'u1')])
+WINNERS = {None: 0, 'black': 1, 'white': 2}
+WINNER_NAMES = {v: k for k, v in WINNERS.items()}
+
+
+def move_dtype(rows: int, cols: int):
+    """dtype of a move on a board of rows by cols."""
+    return np.dtype('u1') if rows * cols <= 256 else np.dtype('<u2')
+
+
+def check_board(rows: int, cols: int):
+    """Raise ValueError if a board of rows by cols is not recordable."""
+    if not (0 < rows <= 255 and 0 < cols <= 255):
+        raise ValueError(f'a {rows}x{cols} board is not recordable, the '
+                         'boards are up to 255x255.')
+
+
+def encode(moves, rows: int, cols: int, winner: str = None, black: str = '',
+           white: str = '', opening: int = 0) -> bytes:
+    """
+    Encode a game.
+
+    Parameters
+    ----------
+    moves: list
+        (row, col, ...) of the plays, black first, the items after col are
+        ignored, so `Game.moves` can be given.
+    winner: str or None
+        'black', 'white' or None for a draw.
+    black, white: str
+        names or specs of the players, up to 255 bytes.
+    opening: int
+        number of the random opening plays.
+    """
+    check_board(rows, cols)
+    if len(moves) > 65535 or not 0 <= opening <= 255:
+        raise ValueError(f'{len(moves)} plies with {opening} opening plays '
+                         'are not recordable.')
+    for m in moves:
+        if not (0 <= m[0] < rows and 0 <= m[1] < cols):
+            raise ValueError(f'the play {(m[0], m[1])} is out of the '
+                             f'{rows}x{cols} board.')
+    black = black.encode()[:255]
+    white = white.encode()[:255]
+    index = np.array([m[0] * cols + m[1] for m in moves],
+                     dtype=move_dtype(rows, cols))
+    header = np.array([(rows, cols, WINNERS[winner], opening, len(index),
+                        len(black), len(white))], dtype=HEADER)
+    return header.tobytes() + black + white + index.tobytes()
+
+
+def decode(buf, offset: int):
+    """
+    Decode the game at `offset` of `buf`.
+
+    Returns
+    -------
+    record: dict or None
+        {"black", "white", "rows", "cols", "winner", "opening", "moves"},
+        moves are (row, col) of the plays. None if the game is cut.
+    offset: int
+        the offset of the next game.
+    """
+    if offset + HEADER.itemsize > len(buf):
+        return None, offset
+    h = np.frombuffer(buf, dtype=HEADER, count=1, offset=offset)[0]
+    rows, cols, plies = int(h['rows']), int(h['cols']), int(h['plies'])
+    names = offset + HEADER.itemsize
+    start = names + int(h['black']) + int(h['white'])
+    dtype = move_dtype(rows, cols)
+    end = start + plies * dtype.itemsize
+    if end > len(buf):
+        return None, offset
+    index = np.frombuffer(buf, dtype=dtype, count=plies, offset=start)
+    record = {
+        'black': bytes(buf[names:names + int(h['black'])]).decode(),
+        'white': bytes(buf[names + int(h['black']):start]).decode(),
+        'rows': rows,
+        'cols': cols,
+        'winner': WINNER_NAMES[int(h['winner'])],
+        'opening': int(h['opening']),
+        'moves': [divmod(int(i), cols) for i in index],
+    }
+    return record, end
+
+
+class RecordWriter:
+    def __init__(self, path: str) -> None:
+        """
+        Open the record file to append games, it is created if not exists.
+        """
+        self.f = open(path, 'ab', buffering=0)
+        if self.f.tell() == 0:
+            self.f.write(MAGIC)
+        self.games = 0
+
+    def write(self, moves, rows: int, cols: int, winner: str = None,
+              black: str = '', white: str = '', opening: int = 0):
+        """Append a game, see `encode` for the parameters."""
+        self.f.write(encode(moves, rows, cols, winner, black, white, opening))
+        self.games += 1
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def is_record_file(path: str):
+    """True if the file is a record file."""
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def read_records(path: str):
+    """
+    Read the games of a record file.
+
+    Yields
+    ------
+    record: dict
+        a game, see `decode`.
+    """
+    if os.path.getsize(path) <= len(MAGIC):
+        return
+    buf = np.memmap(path, dtype=np.uint8, mode='r')
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ValueError(f'not a record file: {path}')
+    offset = len(MAGIC)
+    while True:
+        record, offset = decode(buf, offset)
+        if record is None:
+            break
+        yield record
+
+
+def replay(record: dict, game, show: bool = True, delay: float = 0.0):
+    """
+    Replay a game into `gobang_cli.Game`.
+
+    The board, the position, the steps and the moves (with 0 seconds) of the 
+    game are set as if the game was played, and the board is shown after 
+    every play.
+    """
+    game.clear()
+    for row, col in record['moves']:
+        game.put(row, col, 1 + game.steps % 2)
+        game.moves.append((row, col, 0.0))
+        game.steps += 1
+        if show:
+            game.show()
+            time.sleep(delay)
+    if show:
+        winner = record['winner']
+        print(f"{record[winner]} ({winner}) win!" if winner else "Draw!")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Binary game records.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    p = commands.add_parser('show', help='print the summary of the games.')
+    p.add_argument('file')
+    p = commands.add_parser('replay', help='replay a game on the console.')
+    p.add_argument('file')
+    p.add_argument('game', type=int, nargs='?', default=0)
+    p.add_argument('--delay', type=float, default=0.5)
+    args = parser.parse_args()
+    if args.command == 'show':
+        results = {None: 0, 'black': 0, 'white': 0}
+        plies = 0
+        for record in read_records(args.file):
+            results[record['winner']] += 1
+            plies += len(record['moves'])
+        games = sum(results.values())
+        print(f'{args.file}: {games} games, black {results["black"]}, '
+              f'white {results["white"]}, draws {results[None]}, '
+              f'{plies / max(1, games):.1f} plies per game')
+    else:
+        from gobang_cli import Game
+        for i, record in enumerate(read_records(args.file)):
+            if i == args.game:
+                board = np.zeros((record['rows'], record['cols']))
+                replay(record, Game(board), delay=args.delay)
+                break
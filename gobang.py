@@ -4,13 +4,22 @@ Gobang GUI program
 Copyright (c) 2022 falwat, under MIT License.
 """
 from tkinter import *
+from tkinter import filedialog, simpledialog
+import queue
+import threading
+import traceback
 import numpy as np
 from enum import Enum
 from mainwindow import Mainwindow
-from minimax import Minimax
+from gobang_cli import Game
+from gamerecord import read_records
+from minimax import Minimax, warm_up
 from agent import Agent
 from utils import Piece, check
+from boardstate import BoardState
 from random_agent import RandomAgent
+from mcts import MCTS
+from position import Position
 
 PIECES_IN_LINE = 5
 BOARD_ROWS = 19
@@ -21,6 +30,10 @@ BOARDER_PAD = 25
 PIECE_RADIUS = BOARD_GRID_SIZE * 2 // 5
 BOARD_WIDTH = 2 * BOARDER_PAD + BOARD_GRID_SIZE * (BOARD_COLS-1)
 BOARD_HEIGHT = 2 * BOARDER_PAD + BOARD_GRID_SIZE * (BOARD_ROWS-1)
+# milliseconds between two polls of the play of the worker thread.
+POLL_INTERVAL = 15
+# milliseconds between two plays of a replay.
+REPLAY_INTERVAL = 300
 
 
 class GameState(Enum):
@@ -29,8 +42,8 @@ class GameState(Enum):
     Over = 2
 
 class ManualAgent(Agent):
-    def __init__(self, name: str, piece: Piece) -> None:
-        super().__init__(name, piece)
+    def __init__(self, name: str, piece: Piece, **kwargs) -> None:
+        super().__init__(name, piece, **kwargs)
     
     def play(self, board: np.ndarray, steps: int):
         """dumy play, do nothing."""
@@ -49,6 +62,18 @@ class Gobang(Mainwindow):
         self.num_game = 0
         self.last_row = -1
         self.last_col = -1
+        # the AI plays in a worker thread, which puts (search_id, kind, value) 
+        # and the statistics records to the queues, the mainloop polls them. 
+        # `search_id` counts the searches, so the play of a search cancelled 
+        # by restart is dropped. kind is 'play' for a play (row, col), or 
+        # 'game' for a game played headless by the fast repeat, (moves, 
+        # steps, winner), or 'error' for the message of an exception raised 
+        # by the agent, which ends the game.
+        self.results = queue.Queue()
+        self.records = queue.Queue()
+        self.search_id = 0
+        self.searching = None
+        self.players = []
 
         self.create_menu()
         self.canvas = Canvas(self.mainframe, width=BOARD_WIDTH, height=BOARD_HEIGHT, background='gray55')
@@ -67,6 +92,7 @@ class Gobang(Mainwindow):
         # set window's geometry size
         self.master.geometry('800x650')
         self.showmessage('Ready.')
+        self.after(POLL_INTERVAL, self.poll_play)
 
     def create_menu(self):
         self.game_menu = Menu(self.menubar)
@@ -83,16 +109,28 @@ class Gobang(Mainwindow):
                                     underline=0, accelerator='Ctrl+P')
         self.game_menu.add_command(label='Restart', command=self.restart, 
                                     underline=0, accelerator='Ctrl+R')
+        self.game_menu.add_command(label='Replay...', command=self.open_record, 
+                                    underline=2)
         self.game_menu.add_separator()
         self.game_menu.add_cascade(menu=self.repeat_menu, label='repeat', underline=5)
         self.repeat_sel = IntVar(value=0)
         self.repeat_menu.add_radiobutton(label='None', variable=self.repeat_sel, value=0)
         for i in range(1, 5):
             self.repeat_menu.add_radiobutton(label=f'{2**i * 100}', variable=self.repeat_sel, value=i)
+        # play the repeated AI games headless, only the final board and the 
+        # score are drawn.
+        self.fast_repeat = BooleanVar(value=False)
+        self.repeat_menu.add_separator()
+        self.repeat_menu.add_checkbutton(label='Fast', variable=self.fast_repeat, 
+                                         underline=0)
         self.player0_sel = IntVar(value=0)
         for i, agent in enumerate(self.player_agents):
             self.player0_menu.add_radiobutton(label=agent.__name__, variable=self.player0_sel, value=i)
 
+        self.ponder = BooleanVar(value=False)
+        self.option_menu.add_checkbutton(label='Ponder', variable=self.ponder, 
+                                         underline=0)
+
         self.player1_sel = IntVar(value=0)
         for i, agent in enumerate(self.player_agents):
             self.player1_menu.add_radiobutton(label=agent.__name__, variable=self.player1_sel, value=i)
@@ -100,8 +138,40 @@ class Gobang(Mainwindow):
     def append_output(self, msg: str):
         self.output_text.insert('end', msg + '\n')
 
+    def post_stats(self, player: Agent, record: dict):
+        """called by the worker thread, the record is shown by the mainloop."""
+        self.records.put((player, record))
+
+    def show_stats(self, player: Agent, record: dict):
+        """show the statistics record of a play, see `Minimax.play_record`."""
+        if record['source'] == 'mcts':
+            self.append_output(f"{record['step']:>3} {player.name}: "
+                               f"{record['move']} {record['playouts']} playouts, "
+                               f"{record['playouts_per_second']:.0f}/s, "
+                               f"win rate {record['win_rate']:.0%}, "
+                               f"{record['seconds']:.2f}s")
+        elif record['source'] != 'search':
+            self.append_output(f"{record['step']:>3} {player.name}: "
+                               f"{record['move']} by {record['source']}, "
+                               f"{record['threat_nodes']} threat nodes, "
+                               f"{record['seconds']:.2f}s")
+        else:
+            self.append_output(f"{record['step']:>3} {player.name}: "
+                               f"{record['move']} depth {record['depth']}, "
+                               f"{record['nodes']} nodes, "
+                               f"tt {record['tt_hit_rate']:.0%}, "
+                               f"first cut {record['first_cutoff_rate']:.0%}, "
+                               f"{record['mean_candidates']:.1f} cands, "
+                               f"{record['seconds']:.2f}s")
+        self.output_text.see('end')
+
     def init_board(self):
+        """draw the grid and create the hidden stones, once."""
         self.board = np.zeros((BOARD_ROWS, BOARD_COLS))
+        # the patterns of the board, for the win and the draw.
+        self.state = BoardState(BOARD_ROWS, BOARD_COLS)
+        # the position the agents play on.
+        self.position = Position(BOARD_ROWS, BOARD_COLS)
         xlim = [BOARDER_PAD, BOARDER_PAD + (BOARD_COLS-1) * BOARD_GRID_SIZE]
         ylim = [BOARDER_PAD, BOARDER_PAD + (BOARD_ROWS-1) * BOARD_GRID_SIZE]
         # boarder
@@ -121,6 +191,29 @@ class Gobang(Mainwindow):
             x = BOARDER_PAD + col * BOARD_GRID_SIZE
             self.canvas.create_line(x,ylim[0], x, ylim[1])
 
+        # a stone item per point, a play only shows it.
+        self.stones = np.zeros((BOARD_ROWS, BOARD_COLS), dtype=int)
+        for row in range(BOARD_ROWS):
+            for col in range(BOARD_COLS):
+                y = col * BOARD_GRID_SIZE + BOARDER_PAD
+                x = row * BOARD_GRID_SIZE + BOARDER_PAD
+                self.stones[row, col] = self.canvas.create_oval(
+                    x - PIECE_RADIUS, y - PIECE_RADIUS, 
+                    x + PIECE_RADIUS, y + PIECE_RADIUS, 
+                    state='hidden', tags='stone')
+
+    def clear_board(self):
+        self.board[:, :] = 0
+        self.state.build(self.board)
+        self.position.clear()
+        self.canvas.itemconfigure('stone', state='hidden')
+        self.canvas.delete('win')
+
+    def draw_stone(self, row, col, value):
+        color = 'black' if value == Piece.black.value else 'white'
+        self.canvas.itemconfigure(int(self.stones[row, col]), fill=color, 
+                                  outline=color, state='normal')
+
     def button_clicked(self, event):
         if self.game_state == GameState.Running and \
             isinstance(self.players[self.steps % 2], ManualAgent):
@@ -132,11 +225,10 @@ class Gobang(Mainwindow):
                 self.append_output('the position is not empty. try again.')
             else:
                 self.put_piece(player, row, col)
-                ok, pos = check(self.board, player.piece, row, col)
-                if ok == True:
+                if self.state.won(player.piece.value):
+                    ok, pos = check(self.board, player.piece, row, col)
                     self.game_over(player, pos)
-                    if self.repeat_sel != 0 and self.num_game < 2 ** self.repeat_sel.get() * 100:
-                        self.after(100, self.restart)
+                    self.repeat_next()
                 else:
                     self.steps += 1
                     player: Agent = self.players[self.steps % 2]
@@ -144,24 +236,36 @@ class Gobang(Mainwindow):
                     self.after(10, self.play_step)
 
     def put_piece(self, player: Agent, row, col):
+        self.put_stone(row, col, player.piece.value)
+
+    def put_stone(self, row, col, value):
+        """put a stone on the board, the state and the position, and draw it."""
         self.last_row = row
         self.last_col = col
-        y = col * BOARD_GRID_SIZE + BOARDER_PAD
-        x = row * BOARD_GRID_SIZE + BOARDER_PAD
-        self.board[row, col] = player.piece.value
-        if player.piece == Piece.black:
-            color = 'black'
-        else:
-            color = 'white'
-        self.canvas.create_arc(x - PIECE_RADIUS, y - PIECE_RADIUS, 
-                        x + PIECE_RADIUS, y + PIECE_RADIUS, 
-                        fill=color, outline=color, 
-                        start=0, extent=359, width=0)
+        self.board[row, col] = value
+        self.state.make(row, col, value)
+        self.position.make(row, col, value)
+        self.draw_stone(row, col, value)
+
+    def fast_mode(self):
+        """True if the games are played headless by the fast repeat."""
+        agents = [self.player_agents[self.player0_sel.get()], 
+                  self.player_agents[self.player1_sel.get()]]
+        return self.fast_repeat.get() and self.repeat_sel.get() != 0 and \
+            ManualAgent not in agents
 
     def start(self):
+        self.cancel_search()
+        self.stop_players()
+        # no statistics in the fast repeat, the output is not drawn.
+        on_stats = None if self.fast_mode() else self.post_stats
         self.players = [
-            self.player_agents[self.player0_sel.get()]("Black", Piece.black), 
-            self.player_agents[self.player1_sel.get()]("White", Piece.white)
+            self.player_agents[self.player0_sel.get()]("Black", Piece.black, 
+                                                       on_stats=on_stats, 
+                                                       ponder=self.ponder.get()), 
+            self.player_agents[self.player1_sel.get()]("White", Piece.white, 
+                                                       on_stats=on_stats, 
+                                                       ponder=self.ponder.get())
         ]
         self.game_state = GameState.Running
         self.showmessage(f'Start.')
@@ -169,9 +273,21 @@ class Gobang(Mainwindow):
         self.showmessage(f"{player.name}'s turn")
         self.after(10, self.play_step)
 
+    def cancel_search(self):
+        """stop the search in progress, its play is dropped."""
+        self.search_id += 1
+        if self.searching is not None:
+            self.searching.stop()
+            self.searching = None
+
+    def stop_players(self):
+        """stop the thinking of the players in the background, such as pondering."""
+        for player in self.players:
+            player.stop()
+
     def restart(self):
-        self.canvas.delete('all')
-        self.init_board()
+        self.cancel_search()
+        self.clear_board()
         self.steps = 0
         self.last_row = -1
         self.last_col = -1
@@ -179,47 +295,193 @@ class Gobang(Mainwindow):
         self.start()
         self.showmessage('Restart.')
 
+    def open_record(self):
+        """replay a game of a record file, see `gamerecord.py`."""
+        path = filedialog.askopenfilename(title='Replay', filetypes=[
+            ('game records', '*.rec'), ('all files', '*')])
+        if not path:
+            return
+        records = [r for r in read_records(path) 
+                   if (r['rows'], r['cols']) == (BOARD_ROWS, BOARD_COLS)]
+        if len(records) == 0:
+            self.showmessage(f'no {BOARD_ROWS}x{BOARD_COLS} game in {path}.')
+            return
+        i = simpledialog.askinteger('Replay', f'game (0-{len(records)-1}):', 
+                                    initialvalue=len(records)-1, minvalue=0, 
+                                    maxvalue=len(records)-1)
+        if i is None:
+            return
+        self.cancel_search()
+        self.stop_players()
+        self.clear_board()
+        self.game_state = GameState.Idle
+        self.append_output(f"replay: {records[i]['black']} vs {records[i]['white']}")
+        self.replay_step(self.search_id, records[i], 0)
+
+    def replay_step(self, replay_id: int, record: dict, ply: int):
+        # stopped by start, restart or another replay.
+        if replay_id != self.search_id:
+            return
+        moves = record['moves']
+        if ply == len(moves):
+            winner = record['winner']
+            if winner is not None:
+                row, col = moves[-1]
+                ok, pos = check(self.board, int(self.board[row, col]), row, col)
+                if ok:
+                    self.draw_win(pos)
+            self.showmessage(f"{record[winner]} won." if winner else "No one won.")
+            return
+        row, col = moves[ply]
+        self.put_stone(row, col, 1 + ply % 2)
+        self.showmessage(f'replay {ply + 1}/{len(moves)}')
+        self.after(REPLAY_INTERVAL, self.replay_step, replay_id, record, ply + 1)
+
     def play_step(self):
-        if self.game_state == GameState.Running and \
+        if self.game_state == GameState.Running and self.searching is None and \
+            self.fast_mode():
+            game = Game(np.zeros((BOARD_ROWS, BOARD_COLS)), self.pieces_in_line)
+            self.searching = game
+            games = 2 ** self.repeat_sel.get() * 100 - self.num_game
+            threading.Thread(target=self.play_games, 
+                             args=(self.search_id, game, self.players, games), 
+                             daemon=True).start()
+        elif self.game_state == GameState.Running and self.searching is None and \
             not isinstance(self.players[self.steps % 2], ManualAgent):
             player: Agent = self.players[self.steps % 2]
-            row, col = player.play(self.board, self.last_row, self.last_col,
-                                     self.steps)
-            self.put_piece(player, row, col)
-            ok, pos = check(self.board, player.piece, row, col)
-            if ok == True:
-                self.game_over(player, pos)
-                if self.repeat_sel.get() != 0 and self.num_game < 2 ** self.repeat_sel.get() * 100:
-                    self.after(100, self.restart)
-            elif len(np.nonzero(self.board == 0)[0]) == 0:
-                self.game_state = GameState.Over
-                self.num_game += 1
-                self.showmessage(f"No one won. Game Over.")
-                if self.repeat_sel.get() != 0 and self.num_game < 2 ** self.repeat_sel.get() * 100:
-                    self.after(100, self.restart)
+            self.searching = player
+            # the agent plays on a copy, the position is only changed by the 
+            # mainloop.
+            threading.Thread(target=self.search, 
+                             args=(self.search_id, player, self.position.copy()), 
+                             daemon=True).start()
+
+    def search(self, search_id: int, player: Agent, position: Position):
+        """the worker thread of a play."""
+        try:
+            pos = player.play_position(position)
+        except Exception as e:
+            traceback.print_exc()
+            self.results.put((search_id, 'error', f'{player.name}: {e!r}'))
+        else:
+            self.results.put((search_id, 'play', pos))
+
+    def play_games(self, search_id: int, game: Game, players: list, games: int):
+        """the worker thread of the fast repeat, plays the games headless."""
+        try:
+            for i in range(games):
+                winner = game.start(players, show=False)
+                if game.stopped:
+                    break
+                self.results.put((search_id, 'game', (list(game.moves), 
+                                                      game.steps, winner)))
+        except Exception as e:
+            traceback.print_exc()
+            self.results.put((search_id, 'error', repr(e)))
+
+    def poll_play(self):
+        """take the records and the play of the worker thread, if any."""
+        self.after(POLL_INTERVAL, self.poll_play)
+        while not self.records.empty():
+            self.show_stats(*self.records.get_nowait())
+        games = []
+        error = None
+        while not self.results.empty():
+            search_id, kind, value = self.results.get_nowait()
+            if search_id != self.search_id or value is None:
+                continue
+            if kind == 'game':
+                games.append(value)
+            elif kind == 'error':
+                error = value
             else:
-                self.steps += 1
-                player: Agent = self.players[self.steps % 2]
-                self.showmessage(f"{player.name}'s turn")
-                self.after(1, self.play_step)
+                self.finish_step(value)
+        if len(games) > 0:
+            self.finish_games(games)
+        if error is not None:
+            self.search_error(error)
+
+    def search_error(self, msg: str):
+        """the agent raised an exception in the worker thread, end the game."""
+        self.searching = None
+        self.game_state = GameState.Over
+        self.stop_players()
+        self.append_output(f'error: {msg}')
+        self.showmessage('Error. Game Over.')
+
+    def finish_games(self, games: list):
+        """count the games of the fast repeat, and draw the last one."""
+        for moves, steps, winner in games:
+            self.num_game += 1
+            if winner is not None:
+                self.num_wins[(steps - 1) % 2] += 1
+        moves, steps, winner = games[-1]
+        self.clear_board()
+        for i, (row, col, seconds) in enumerate(moves):
+            self.put_stone(row, col, 1 + i % 2)
+        if winner is not None:
+            ok, pos = check(self.board, winner.piece, row, col)
+            self.draw_win(pos)
+        self.append_output(f"won times: {self.num_wins[0]}, {self.num_wins[1]}")
+        self.showmessage(f"{self.num_game} games.")
+        if self.num_game >= 2 ** self.repeat_sel.get() * 100:
+            self.game_state = GameState.Over
+            self.searching = None
+            self.stop_players()
+
+    def finish_step(self, pos):
+        """put the play of the AI and go to the next turn."""
+        player: Agent = self.searching
+        self.searching = None
+        row, col = pos
+        self.put_piece(player, row, col)
+        if self.state.won(player.piece.value):
+            ok, pos = check(self.board, player.piece, row, col)
+            self.game_over(player, pos)
+            self.repeat_next()
+        elif self.state.full():
+            self.no_winner()
+            self.repeat_next()
+        else:
+            self.steps += 1
+            player: Agent = self.players[self.steps % 2]
+            self.showmessage(f"{player.name}'s turn")
+            self.after(1, self.play_step)
+
+    def repeat_next(self):
+        """restart for the next game of the repeat, if any."""
+        if self.repeat_sel.get() != 0 and self.num_game < 2 ** self.repeat_sel.get() * 100:
+            self.after(100, self.restart)
+
+    def no_winner(self):
+        self.game_state = GameState.Over
+        self.stop_players()
+        self.num_game += 1
+        self.showmessage(f"No one won. Game Over.")
 
     def game_over(self, player: Agent, pos):
         self.game_state = GameState.Over
+        self.stop_players()
         self.num_game += 1
         self.num_wins[self.steps % 2] += 1
         self.append_output(f"won times: {self.num_wins[0]}, {self.num_wins[1]}")
         self.showmessage(f"{player.name} won. Game Over.")
+        self.draw_win(pos)
+
+    def draw_win(self, pos):
+        """draw the line of the five, pos is the ends of the five by `check`."""
         self.canvas.create_line(
                 pos[0] * BOARD_GRID_SIZE + BOARDER_PAD, 
                 pos[1] * BOARD_GRID_SIZE + BOARDER_PAD, 
                 pos[2] * BOARD_GRID_SIZE + BOARDER_PAD, 
                 pos[3] * BOARD_GRID_SIZE + BOARDER_PAD, 
-                fill='red', width=3)
+                fill='red', width=3, tags='win')
 
 
 
 if __name__ == '__main__':
+    warm_up()
     root = Tk()
-    player_agents = [ManualAgent, RandomAgent, Minimax]
+    player_agents = [ManualAgent, RandomAgent, Minimax, MCTS]
     Gobang(root, player_agents)
     root.mainloop()
\ No newline at end of file
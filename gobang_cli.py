@@ -3,48 +3,159 @@ Gobang CLI(Command Line Interface) program.
 
 Copyright (c) 2022 falwat, under MIT License.
 """
+import argparse
+import time
 import numpy as np
 from agent import Agent
-from utils import Piece, check, show_board
+from position import Position
+from sparse import SparseBoard
+from utils import Piece, show_board
 
 class ManualAgent(Agent):
     def __init__(self, name: str, piece: Piece) -> None:
         super().__init__(name, piece)
 
     def play(self, board: np.ndarray, last_row: int = 0, last_col=0, steps: int = 0):
+        row, col = self.ask(board)
+        board[row][col] = self.piece.value
+        return row, col
+
+    def play_position(self, position):
+        return self.ask(position.board)
+
+    def play_sparse(self, board):
+        return self.ask(board)
+
+    def ask(self, board):
         while True:
             pos = input(f"Input {self.name} position(row,col):")
             row, col = [int(s) for s in pos.split(',')]
-            if board[row][col] == 0:
-                board[row][col] = self.piece.value
+            if board[row, col] == 0:
                 break
             else:
                 print("Error: The position is not empty! Try again.")
         return row, col
 
 class Game:
-    def __init__(self, board: np.ndarray, pieces_in_line: int=5) -> None:
+    def __init__(self, board, pieces_in_line: int=5) -> None:
+        """
+        board: np.ndarray or sparse.SparseBoard
+            the game board. the players play on a `position.Position` of 
+            an array, and on a sparse board itself, see 
+            `Agent.play_sparse`.
+        """
         self.pieces_in_line = pieces_in_line
         self.board = board
+        self.sparse = isinstance(board, SparseBoard)
+        # the position the players play on, `board` follows it.
+        if self.sparse:
+            self.position = board
+        else:
+            self.position = Position(board.shape[0], board.shape[1])
         self.steps = 0
+        # (row, col, seconds) of the plays of the last game.
+        self.moves = []
+        self.players = []
+        # set by `stop`, the game in progress ends without a winner.
+        self.stopped = False
+
+    def start(self, players: list, show: bool = True, opening: list = ()):
+        """
+        Play a game.
+
+        Parameters
+        ----------
+        players: list
+            [black player, white player].
+        show: bool
+            show the board and the result, False for playing headless.
+        opening: list
+            (row, col) of the plays made before the players start, black 
+            first. they are in `self.moves` with 0 seconds.
+
+        Returns
+        -------
+        winner: Agent or None
+            the player won, None for a draw.
+        """
+        self.clear()
+        self.players = players
+        for row, col in opening:
+            self.put(row, col, players[self.steps % 2].piece.value)
+            self.moves.append((row, col, 0.0))
+            self.steps += 1
+        if show:
+            self.show()
+        try:
+            while not self.position.full() and not self.stopped:
+                player: Agent = players[self.steps % 2]
+                t = time.perf_counter()
+                if self.sparse:
+                    pos = player.play_sparse(self.position)
+                else:
+                    pos = player.play_position(self.position)
+                t = time.perf_counter() - t
+                if pos is None:
+                    # stopped.
+                    break
+                row, col = pos
+                self.put(row, col, player.piece.value)
+                self.moves.append((row, col, t))
+                if show:
+                    self.show()
+                self.steps += 1
+                if self.position.won(self.pieces_in_line):
+                    if show:
+                        print(f"{player.name} win!")
+                    return player
+        finally:
+            # stop the thinking in the background, such as pondering.
+            for agent in players:
+                agent.stop()
+        if show:
+            print("Draw!")
+        return None
 
-    def start(self, players: list):
-        self.board[:,:] = 0
+    def clear(self):
+        """take all the stones away."""
+        self.position.clear()
+        if not self.sparse:
+            self.board[:,:] = 0
         self.steps = 0
-        show_board(self.board)
-        while True:
-            player: Agent = players[self.steps % 2]
-            row, col = player.play(self.board, self.steps)
+        self.moves = []
+
+    def put(self, row: int, col: int, value: int):
+        self.position.make(row, col, value)
+        if not self.sparse:
+            self.board[row, col] = value
+
+    def show(self):
+        """show the board, the window around the stones of a sparse board."""
+        if self.sparse:
+            grid, row0, col0 = self.board.window(margin=1)
+            print(f'rows from {row0}, cols from {col0}:')
+            show_board(grid)
+        else:
             show_board(self.board)
-            self.steps += 1
-            if check(self.board, player.piece, row, col)[0]:
-                print(f"{player.name} win!")
-                break
+
+    def stop(self):
+        """Stop the game in progress, called from another thread."""
+        self.stopped = True
+        for agent in self.players:
+            agent.stop()
 
 
 
 if __name__ == "__main__":
-    board = np.zeros((9,9))
+    parser = argparse.ArgumentParser(description='Gobang on the console.')
+    parser.add_argument('-s', '--size', type=int, default=9)
+    parser.add_argument('--unbounded', action='store_true',
+                        help='play on an unbounded sparse board.')
+    args = parser.parse_args()
+    if args.unbounded:
+        board = SparseBoard()
+    else:
+        board = np.zeros((args.size, args.size))
     game = Game(board)
     black_player = ManualAgent('black', Piece.black)
     white_player = ManualAgent('white', Piece.white)
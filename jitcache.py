@@ -0,0 +1,66 @@
+"""
+The cache of the compiled njit functions.
+
+numba saves a compiled function in the cache by the source file of the
+function only, and compiles it again when that file changes, but not when
+a function or a table of another file that it calls changes, and the cache
+keeps running the old code. So the cache directory is keyed on a hash of
+the sources of all the modules that compile by numba: any edit of one of
+them starts a new directory, and `remove_stale` removes the old ones.
+
+The modules import `njit` and `objmode` from here instead of from numba,
+so the directory is set before the first function is decorated. The
+directories are in `__pycache__/numba` of the checkout, or, if
+`NUMBA_CACHE_DIR` is set, in a directory of it named by a hash of the path
+of the checkout, so checkouts sharing it never remove the caches of each
+other. A directory written in the last hour is not removed, a process of
+the former sources may still be loading from it.
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import glob
+import hashlib
+import os
+import shutil
+import time
+import numba
+from numba import njit, objmode
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# seconds since the last write to a stale cache directory before removing it.
+STALE_SECONDS = 3600
+
+
+def source_hash():
+    """Hash of the sources of the modules that import this module."""
+    h = hashlib.sha1()
+    for path in sorted(glob.glob(os.path.join(HERE, '*.py'))):
+        with open(path, 'rb') as f:
+            source = f.read()
+        if b'jitcache' in source:
+            h.update(os.path.basename(path).encode())
+            h.update(source)
+    return h.hexdigest()[:16]
+
+
+if os.environ.get('NUMBA_CACHE_DIR'):
+    CACHE_ROOT = os.path.join(
+        os.environ['NUMBA_CACHE_DIR'],
+        'gobang-' + hashlib.sha1(HERE.encode()).hexdigest()[:8])
+else:
+    CACHE_ROOT = os.path.join(HERE, '__pycache__', 'numba')
+CACHE_DIR = os.path.join(CACHE_ROOT, source_hash())
+numba.config.CACHE_DIR = CACHE_DIR
+
+
+def remove_stale():
+    """
+    Remove the cache directories of the former sources of this checkout,
+    not written for `STALE_SECONDS`.
+    """
+    now = time.time()
+    for path in glob.glob(os.path.join(CACHE_ROOT, '*')):
+        if os.path.isdir(path) and path != CACHE_DIR and \
+                len(os.path.basename(path)) == 16 and \
+                now - os.path.getmtime(path) > STALE_SECONDS:
+            shutil.rmtree(path, ignore_errors=True)
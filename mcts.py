@@ -0,0 +1,383 @@
+"""
+Monte Carlo Tree Search agent.
+
+The tree is kept in flat arrays allocated once, a node is an index and its
+children are a block of consecutive nodes. Every playout walks down the
+tree by UCT, adds the children of the leaf, and plays random moves among
+the candidates (the blanks next to a piece, see `candidates.py`) until a
+five by `utils.check_value` or a full board. The playouts run in njit code
+in batches, between which the limits and `stop` are checked.
+
+After a play, the subtree of the play and the reply of the opponent is
+kept for the next play, while the tree has room.
+
+The fives found are proven up the tree (MCTS-Solver): a node whose reply
+makes a five is lost for its player, and a node whose replies are all lost
+is won, so the proven nodes are chosen or avoided at once instead of by
+the average of many playouts.
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import time
+import numpy as np
+from jitcache import njit
+from agent import Agent
+from candidates import CandidateSet, make, unmake
+from utils import Piece, check_value
+
+# the terminal state of a node.
+OPEN = 0     # not decided.
+WON = 1      # the player of the node wins.
+DRAW = 2     # the board is full.
+LOST = 3     # the player of the node loses.
+# playouts between two reads of the clock.
+BATCH = 64
+
+
+def new_tree(max_nodes: int):
+    """
+    The arrays of a tree of `max_nodes` nodes, as a tuple:
+
+    - parent, move, first (the first child, -1 if not expanded), count
+      (number of children), player (enum value of the piece of the move),
+      terminal: int32 arrays.
+    - visits, wins: float64 arrays, wins are from the view of `player`,
+      0.5 for a draw.
+    - size: int64 array of one element, the number of nodes used.
+    """
+    return (np.full(max_nodes, -1, dtype=np.int32),
+            np.full(max_nodes, -1, dtype=np.int32),
+            np.full(max_nodes, -1, dtype=np.int32),
+            np.zeros(max_nodes, dtype=np.int32),
+            np.zeros(max_nodes, dtype=np.int32),
+            np.zeros(max_nodes, dtype=np.int32),
+            np.zeros(max_nodes, dtype=np.float64),
+            np.zeros(max_nodes, dtype=np.float64),
+            np.zeros(1, dtype=np.int64))
+
+
+@njit(cache=True)
+def new_node(tree: tuple, parent: int, move: int, player: int):
+    """Add a node, returns its index."""
+    parents, moves, first, count, players, terminal, visits, wins, size = tree
+    n = size[0]
+    size[0] += 1
+    parents[n] = parent
+    moves[n] = move
+    first[n] = -1
+    count[n] = 0
+    players[n] = player
+    terminal[n] = OPEN
+    visits[n] = 0.0
+    wins[n] = 0.0
+    return n
+
+
+@njit(cache=True)
+def select(tree: tuple, node: int, c: float):
+    """The child of `node` with the best UCT value, the unvisited first."""
+    parents, moves, first, count, players, terminal, visits, wins, size = tree
+    log_n = np.log(max(visits[node], 1.0))
+    best = -1
+    best_value = -np.inf
+    for child in range(first[node], first[node] + count[node]):
+        if terminal[child] == WON:
+            return child
+        if terminal[child] == LOST:
+            continue
+        if visits[child] == 0:
+            return child
+        value = wins[child] / visits[child] + \
+            c * np.sqrt(log_n / visits[child])
+        if value > best_value:
+            best_value = value
+            best = child
+    return best
+
+
+@njit(cache=True)
+def prove(tree: tuple, node: int):
+    """`node` is won, mark its ancestors that are proven by it."""
+    parents, moves, first, count, players, terminal, visits, wins, size = tree
+    terminal[node] = WON
+    parent = parents[node]
+    while parent >= 0 and terminal[parent] == OPEN:
+        # a reply of the opponent wins.
+        terminal[parent] = LOST
+        grand = parents[parent]
+        if grand < 0:
+            break
+        for child in range(first[grand], first[grand] + count[grand]):
+            if terminal[child] != LOST:
+                return
+        # every reply loses.
+        terminal[grand] = WON
+        parent = parents[grand]
+
+
+@njit(cache=True)
+def playout(board: np.ndarray, piece: int, cands: tuple, tree: tuple,
+            root: int, c: float, stack: np.ndarray, undo: np.ndarray):
+    """
+    One playout from the root, `piece` is to play at the root.
+
+    board and cands are restored before returning, `stack` and `undo` are
+    int32 buffers of board.size for the plays made.
+    """
+    parents, moves, first, count, players, terminal, visits, wins, size = tree
+    cols = board.shape[1]
+    n = 0
+    node = root
+    value = piece
+    winner = 0
+    # selection.
+    while first[node] >= 0 and terminal[node] == OPEN:
+        node = select(tree, node, c)
+        idx = moves[node]
+        board[idx // cols, idx % cols] = value
+        undo[n] = make(cands, board, idx // cols, idx % cols)
+        stack[n] = idx
+        n += 1
+        value = 3 - value
+    if terminal[node] == WON:
+        winner = players[node]
+    elif terminal[node] == LOST:
+        winner = 3 - players[node]
+    elif terminal[node] == OPEN:
+        # expansion, the children are the candidates.
+        k = cands[3][0]
+        if k == 0:
+            terminal[node] = DRAW
+        elif size[0] + k <= parents.shape[0] and \
+                (visits[node] > 0 or node == root):
+            first[node] = size[0]
+            count[node] = k
+            for i in range(k):
+                new_node(tree, node, cands[2][i], value)
+            node = first[node] + np.random.randint(k)
+            idx = moves[node]
+            row = idx // cols
+            col = idx % cols
+            board[row, col] = value
+            undo[n] = make(cands, board, row, col)
+            stack[n] = idx
+            n += 1
+            if check_value(board, value, row, col):
+                prove(tree, node)
+                winner = value
+            value = 3 - value
+        # rollout.
+        while winner == 0 and cands[3][0] > 0:
+            idx = cands[2][np.random.randint(cands[3][0])]
+            row = idx // cols
+            col = idx % cols
+            board[row, col] = value
+            undo[n] = make(cands, board, row, col)
+            stack[n] = idx
+            n += 1
+            if check_value(board, value, row, col):
+                winner = value
+            value = 3 - value
+    for i in range(n - 1, -1, -1):
+        idx = stack[i]
+        unmake(cands, board, idx // cols, idx % cols, undo[i])
+        board[idx // cols, idx % cols] = 0
+    # backpropagation.
+    while node >= 0:
+        visits[node] += 1
+        if winner == 0:
+            wins[node] += 0.5
+        elif winner == players[node]:
+            wins[node] += 1.0
+        node = parents[node]
+
+
+@njit(cache=True)
+def run_playouts(board: np.ndarray, piece: int, cands: tuple, tree: tuple,
+                 root: int, c: float, n: int):
+    """`n` playouts from the root."""
+    stack = np.empty(board.size, dtype=np.int32)
+    undo = np.empty(board.size, dtype=np.int32)
+    for i in range(n):
+        playout(board, piece, cands, tree, root, c, stack, undo)
+
+
+@njit(cache=True)
+def find_child(tree: tuple, node: int, move: int):
+    """The child of `node` by `move`, -1 if not found."""
+    first = tree[2]
+    for child in range(first[node], first[node] + tree[3][node]):
+        if tree[1][child] == move:
+            return child
+    return -1
+
+
+class MCTS(Agent):
+    def __init__(self, name: str, piece: Piece, **kwargs) -> None:
+        super().__init__(name, piece, **kwargs)
+        # seconds to think for one play.
+        self.time_limit = kwargs.get('time_limit', 1.0)
+        # max playouts for one play, None for no limit. the search stops at
+        # whichever of the limits comes first.
+        self.playouts = kwargs.get('playouts', None)
+        # the exploration constant of UCT.
+        self.c = kwargs.get('c', 1.4)
+        self.max_nodes = kwargs.get('max_nodes', 1 << 20)
+        self.tree = new_tree(self.max_nodes)
+        self.root = -1
+        # stones on the board at the root, and the board shape, to tell if 
+        # the tree can be kept.
+        self.root_stones = -1
+        self.root_shape = None
+        # the board coordinates of the window of a sparse board.
+        self.origin = None
+        # playouts of the last play, and the rate.
+        self.visited = 0
+        self.playouts_per_second = 0.0
+        # set by `stop`, the playouts end after the batch in progress.
+        self.stopped = False
+
+    def new_root(self):
+        self.tree[8][0] = 0
+        self.root = new_node(self.tree, -1, -1,
+                             Piece.black.value + Piece.white.value - self.piece.value)
+
+    def reuse(self, grid: np.ndarray, last_row: int, last_col: int, stones: int):
+        """Move the root to the reply of the opponent, if it is in the tree."""
+        child = -1
+        if self.root >= 0 and stones == self.root_stones + 1 and \
+                grid.shape == self.root_shape and grid[last_row, last_col] != 0:
+            child = find_child(self.tree, self.root,
+                               last_row * grid.shape[1] + last_col)
+        # the tree has room for the next play.
+        if child >= 0 and self.tree[8][0] < self.max_nodes // 2:
+            self.root = child
+        else:
+            self.new_root()
+
+    def think(self, grid: np.ndarray, cands: CandidateSet, last_row: int,
+              last_col: int, stones: int, start: float):
+        """
+        Run the playouts on `grid` with `stones` stones, whose candidates 
+        are `cands`, both are restored after every playout.
+
+        Returns
+        -------
+        row, col: the play.
+        """
+        self.root_shape = grid.shape
+        if len(cands) == 0:
+            self.root = -1
+            self.root_stones = stones + 1
+            return grid.shape[0] // 2, grid.shape[1] // 2
+        self.reuse(grid, last_row, last_col, stones)
+        self.visited = 0
+        self.stopped = False
+        while True:
+            run_playouts(grid, self.piece.value, cands.cands, self.tree,
+                         self.root, self.c, BATCH)
+            self.visited += BATCH
+            elapsed = time.perf_counter() - start
+            if (self.playouts is not None and self.visited >= self.playouts) or \
+                    (self.time_limit is not None and elapsed >= self.time_limit) or \
+                    self.stopped:
+                break
+        self.playouts_per_second = self.visited / max(elapsed, 1e-9)
+        parents, moves, first, count, players, terminal, visits, wins, size = self.tree
+        children = np.arange(first[self.root], first[self.root] + count[self.root])
+        # a win at once, else the most visited play not lost.
+        keys = np.where(terminal[children] == LOST, -1.0, visits[children])
+        keys[terminal[children] == WON] = np.inf
+        best = children[np.argmax(keys)]
+        self.root = best
+        self.root_stones = stones + 1
+        return divmod(int(moves[best]), grid.shape[1])
+
+    def stop(self):
+        """
+        Stop the playouts in progress, called from another thread. The play 
+        returns the best child of the root found so far, the first batch of 
+        playouts is always run.
+        """
+        self.stopped = True
+
+    def play(self, board: np.ndarray, last_row: int = 0, last_col=0, steps: int = 0):
+        start = time.perf_counter()
+        grid = board.astype(np.int8)
+        cands = CandidateSet(grid.size)
+        cands.build(grid)
+        row, col = self.think(grid, cands, last_row, last_col,
+                              int(np.count_nonzero(grid)), start)
+        board[row, col] = self.piece.value
+        if self.on_stats is not None:
+            self.on_stats(self, self.play_record(row, col, steps,
+                                                 time.perf_counter() - start))
+        return row, col
+
+    def play_position(self, position):
+        """Play on a `position.Position`, the playouts run on its board and candidates."""
+        start = time.perf_counter()
+        last_row, last_col = position.last
+        row, col = self.think(position.board, position.candidates, last_row,
+                              last_col, position.steps, start)
+        if self.on_stats is not None:
+            self.on_stats(self, self.play_record(row, col, position.steps,
+                                                 time.perf_counter() - start))
+        return row, col
+
+    def play_sparse(self, board):
+        """
+        Play on the window of a `sparse.SparseBoard`, see 
+        `Agent.play_sparse`. The tree is dropped when the window moves, the 
+        plays of its nodes are places of the window.
+        """
+        start = time.perf_counter()
+        grid, row0, col0 = board.window()
+        if (row0, col0) != self.origin:
+            self.root = -1
+        self.origin = row0, col0
+        last_row, last_col = board.last
+        cands = CandidateSet(grid.size)
+        cands.build(grid)
+        row, col = self.think(grid, cands, last_row - row0, last_col - col0,
+                              board.steps, start)
+        row, col = row + row0, col + col0
+        if self.on_stats is not None:
+            self.on_stats(self, self.play_record(row, col, board.steps,
+                                                 time.perf_counter() - start))
+        return row, col
+
+    def play_record(self, row: int, col: int, steps: int, seconds: float) -> dict:
+        """The statistics record of the last play."""
+        visits, wins = self.tree[6], self.tree[7]
+        node = self.root
+        return {
+            'name': self.name,
+            'step': steps,
+            'move': (int(row), int(col)),
+            'source': 'mcts',
+            'seconds': seconds,
+            'playouts': self.visited,
+            'playouts_per_second': self.playouts_per_second,
+            'nodes': int(self.tree[8][0]),
+            'visits': float(visits[node]) if node >= 0 else 0.0,
+            'win_rate': float(wins[node] / max(1.0, visits[node]))
+                        if node >= 0 else 0.0,
+        }
+
+
+if __name__ == '__main__':
+    from utils import check, show_board
+    board = np.zeros((15, 15), dtype=np.int32)
+    players = [MCTS('black', Piece.black, time_limit=1.0),
+               MCTS('white', Piece.white, time_limit=1.0)]
+    row, col = -1, -1
+    for steps in range(board.size):
+        player = players[steps % 2]
+        row, col = player.play(board, row, col, steps)
+        show_board(board)
+        print(f'{player.name}: {player.visited} playouts, '
+              f'{player.playouts_per_second:.0f} playouts/s')
+        if check(board, player.piece, row, col)[0]:
+            print(f'{player.name} win!')
+            break
@@ -3,107 +3,907 @@ The minimax algorithm.
 
 Copyright (c) 2022 falwat, under MIT License.
 """
+import threading
+import time
+import warnings
 import numpy as np
 from gobang_cli import show_board
 from agent import Agent
 from utils import Piece, check, check_value
-from numba import njit
-from numba.typed import List
-
-@njit
-def indexes_union(board: np.ndarray, indexes: list, 
-                    row: int, col: int, span: int = 1):
-    row_lb = max(0, row - span)
-    row_ub = min(board.shape[0], row + span + 1)
-    col_lb = max(0, col - span)
-    col_ub = min(board.shape[1], col + span + 1)
-    section = board[row_lb:row_ub, col_lb:col_ub]
-    row_r, col_r = np.nonzero(section==0)
-    new_idxs = (row_r + row_lb) * board.shape[1] + (col_r + col_lb)
-    union_indexes = indexes[:]
-    for i in new_idxs:
-        if i not in indexes:
-            union_indexes.append(i)
-    for i in range(len(union_indexes)):
-        if union_indexes[i] == row * board.shape[1]  + col:
-            del union_indexes[i]
-            break
-    return union_indexes
-
-@njit
-def indexes_union_init(board: np.ndarray, 
-                    row: int, col: int, span: int = 1):
-    row_lb = max(0, row - span)
-    row_ub = min(board.shape[0], row + span + 1)
-    col_lb = max(0, col - span)
-    col_ub = min(board.shape[1], col + span + 1)
-    section = board[row_lb:row_ub, col_lb:col_ub]
-    row_r, col_r = np.nonzero(section==0)
-    new_idxs = (row_r + row_lb) * board.shape[1] + (col_r + col_lb)
-    union_indexes = List()
-    for i in new_idxs:
-        if i != row * board.shape[1]  + col:
-            union_indexes.append(i)
-    return union_indexes
-
-
-@njit
-def infer(piece: int, board: np.ndarray, indexes: set, 
-        depth: int = 2):
+from evaluation import evaluate
+from bitboard import check_bits, clear_bit, set_bit, to_bitboard
+from transposition import (EXACT, LOWER, UPPER, TranspositionTable, 
+                           board_hash, coordinate_keys, tt_probe, tt_store, 
+                           zobrist_keys)
+from candidates import CandidateSet, make, unmake
+from ordering import (NUM_KILLERS, NUM_KINDS, order_moves, ordering_flags, 
+                      pick, update_heuristics)
+from book import OpeningBook
+from sparse import WINDOW
+from threat import (LIMIT_ABORTED, LIMIT_MAX_NODES, LIMIT_NODES, NUM_LIMITS,
+                    solve, threat_buffers)
+from jitcache import njit, objmode, remove_stale
+from numba.core.errors import NumbaWarning
+
+# alphabeta reads the clock in object mode once in a while, it is expected 
+# that the GIL is taken there.
+warnings.filterwarnings('ignore', message='Code running in object mode', 
+                        category=NumbaWarning)
+
+
+# index of the counters in the search statistics array.
+STAT_NODES = 0
+STAT_TT_HITS = 1
+STAT_INTERIOR = 2       # nodes that searched their children.
+STAT_MOVES = 3          # children searched by the interior nodes.
+STAT_CUTOFFS = 4
+STAT_FIRST_CUTOFFS = 5  # cutoffs by the first move searched.
+STAT_LEAVES = 6         # evaluations at the depth limit.
+STAT_CHECKS = 7         # checks for winning.
+STAT_TT_PROBES = 8
+STAT_MAX_DEPTH = 9      # the deepest ply searched.
+STAT_CANDIDATES = 10    # candidates of the interior nodes.
+STAT_MAX_CANDIDATES = 11
+STAT_CUT_KIND = 12      # cutoffs by the kind of move, see `ordering.KIND_HASH`.
+NUM_STATS = STAT_CUT_KIND + NUM_KINDS
+# the stats that are the max of the threads, not the sum.
+MAX_STATS = (STAT_MAX_DEPTH, STAT_MAX_CANDIDATES)
+
+# index of the search control array.
+CTRL_DEADLINE = 0   # time.perf_counter() to stop the search, inf for no limit.
+CTRL_STOP = 1       # set to nonzero to stop the search.
+NUM_CTRLS = 2
+# the clock is read once every `TIME_CHECK_NODES` nodes.
+TIME_CHECK_NODES = 1024
+# max depth of iterative deepening when only `time_limit` is given.
+MAX_DEPTH = 64
+
+
+def search_buffers(cells: int):
+    """
+    The per-ply buffers of the move ordering of `alphabeta`, allocated 
+    once per search thread instead of once per node.
+
+    Returns
+    -------
+    moves, order_keys, kinds: np.ndarray
+        int32, float64 and int8 arrays of shape (MAX_DEPTH + 1, cells), 
+        row `ply` is used by the node at `ply`, see `ordering.order_moves`.
     """
+    return (np.empty((MAX_DEPTH + 1, cells), dtype=np.int32),
+            np.empty((MAX_DEPTH + 1, cells), dtype=np.float64),
+            np.empty((MAX_DEPTH + 1, cells), dtype=np.int8))
+
+
+def new_rng(seed: int = None):
+    """
+    The state of `next_random`, a uint64 array of one element. None for a 
+    random seed.
+    """
+    if seed is None:
+        seed = np.random.default_rng().integers(1, 1 << 62)
+    # the state of xorshift must not be 0.
+    return np.array([seed or 1], dtype=np.uint64)
+
+
+@njit(cache=True)
+def next_random(rng: np.ndarray):
+    """xorshift64, the next random integer of the state `rng`."""
+    x = rng[0]
+    x ^= x << np.uint64(13)
+    x ^= x >> np.uint64(7)
+    x ^= x << np.uint64(17)
+    rng[0] = x
+    return x
+
+
+@njit(nogil=True, cache=True)
+def infer(piece: int, board: np.ndarray, cands: tuple, 
+        depth: int, stats: np.ndarray, rng: np.ndarray):
+    """
+    Plain minimax search.
+
+    cands: the candidate set, see `candidates.CandidateSet`.
     depth: infer depth
+    stats: int64 array of search counters, see `STAT_NODES`.
+    rng: the random state of `next_random`, one of the best plays is 
+        chosen at random.
     """
-    ps = []
-    for idx in indexes:
+    dense = cands[2]
+    best = -np.inf
+    best_idx = -1
+    # the best plays seen, the play replaces the chosen one with 
+    # probability 1 / ties, so every one of them is chosen equally.
+    ties = 0
+    for n in range(cands[3][0]):
+        idx = dense[n]
         row = idx // board.shape[1]
-        col = idx % board.shape[0]
+        col = idx % board.shape[1]
         board[row, col] = piece
+        stats[STAT_NODES] += 1
+        stats[STAT_CHECKS] += 1
         if check_value(board, piece, row, col) == True:
-            ps.append(np.inf)
             board[row, col] = 0
+            best = np.inf
+            best_idx = idx
             break
         elif depth > 1:
             oppnent_piece = Piece.black.value + Piece.white.value - piece
-            new_indexes = indexes_union(board, indexes, row, col)
-            p, r, c = infer(oppnent_piece, board, new_indexes, depth-1)
-            ps.append(-p)
+            p = make(cands, board, row, col)
+            s, r, c = infer(oppnent_piece, board, cands, depth-1, stats, rng)
+            unmake(cands, board, row, col, p)
+            score = -s
         else:
-            ps.append(0)
+            stats[STAT_LEAVES] += 1
+            score = evaluate(board, piece)
         board[row, col] = 0
-    ps = np.array(ps)
-    i = np.random.choice(np.nonzero(ps == ps.max())[0])
-    row = indexes[i] // board.shape[1]
-    col = indexes[i] % board.shape[0]
-    return ps[i], row, col
+        if score > best or best_idx < 0:
+            best = score
+            best_idx = idx
+            ties = 1
+        elif score == best:
+            ties += 1
+            if next_random(rng) % np.uint64(ties) == 0:
+                best_idx = idx
+    if best_idx < 0:
+        # no place to play, a draw.
+        return 0.0, -1, -1
+    return best, best_idx // board.shape[1], best_idx % board.shape[1]
+
+
+@njit(cache=True)
+def put(board: np.ndarray, bits: np.ndarray, piece: int, row: int, col: int):
+    """Put the piece on the board, and on the bitboard if it is used."""
+    board[row, col] = piece
+    if bits.shape[1] > 0:
+        set_bit(bits, piece, row, col)
+
+
+@njit(cache=True)
+def take(board: np.ndarray, bits: np.ndarray, piece: int, row: int, col: int):
+    """Take the piece back, undo `put`."""
+    board[row, col] = 0
+    if bits.shape[1] > 0:
+        clear_bit(bits, piece, row, col)
+
+
+@njit(cache=True)
+def won(board: np.ndarray, bits: np.ndarray, piece: int, row: int, col: int):
+    """Check for winning, on the bitboard if it is used."""
+    if bits.shape[1] > 0:
+        return check_bits(bits, piece, row, col)
+    return check_value(board, piece, row, col)
+
+
+@njit(nogil=True, cache=True)
+def alphabeta(piece: int, board: np.ndarray, bits: np.ndarray, 
+        cands: tuple, depth: int, ply: int, alpha: float, beta: float, 
+        h, keys: np.ndarray, table: np.ndarray, age: int, 
+        killers: np.ndarray, history: np.ndarray, ordering: int, 
+        stats: np.ndarray, control: np.ndarray, root_moves: np.ndarray, 
+        buffers: tuple):
+    """
+    Fail-soft alpha-beta search with transposition table.
+
+    Returns the same score as `infer` when called with the full window
+    (-inf, inf), but skips the moves that can not change the result. The GIL
+    is released, so the threads of `Minimax.deepen` run it in parallel.
+
+    Parameters
+    ----------
+    piece: int
+        enum value of the piece to play.
+    board: np.ndarray
+        the game board, restored before returning.
+    bits: np.ndarray
+        the bitboard of `board`, see `bitboard.to_bitboard`. it is used for
+        checking for winning when it has rows, and kept the same as `board`.
+    cands: tuple
+        the candidate set of the next play, see `candidates.CandidateSet`.
+        restored before returning.
+    depth: int
+        search depth.
+    ply: int
+        distance to the root.
+    alpha, beta: float
+        the search window.
+    h: np.uint64
+        Zobrist hash of the board, see `transposition.board_hash`.
+    keys: np.ndarray
+        the Zobrist keys of the board.
+    table: np.ndarray
+        the transposition table, see `transposition.TranspositionTable`.
+    age: int
+        the age of the current search.
+    killers: np.ndarray
+        int32 array of shape (max ply, `NUM_KILLERS`), the killer moves.
+    history: np.ndarray
+        int64 array of shape (3, cells), the history table.
+    ordering: int
+        the move ordering flags, see `ordering.ORDER_ALL`.
+    stats: np.ndarray
+        int64 array of search counters, see `STAT_NODES`.
+    control: np.ndarray
+        float64 array to stop the search, see `CTRL_DEADLINE`.
+    root_moves: np.ndarray
+        int32 array, the indexes of the candidates allowed at the root, 
+        empty for all.
+    buffers: tuple
+        the move ordering buffers, see `search_buffers`.
+
+    Returns
+    -------
+    score, row, col: the score of the best play from the view of `piece`.
+        when the score fails low or high, it is a bound of the real score.
+        the result is meaningless if `control[CTRL_STOP]` is set.
+    """
+    pos = cands[1]
+    restricted = ply == 0 and root_moves.shape[0] > 0
+    hash_idx = -1
+    stats[STAT_TT_PROBES] += 1
+    found, tt_score, move, tt_depth, flag = tt_probe(table, h)
+    if found:
+        stats[STAT_TT_HITS] += 1
+        if move >= 0 and pos[move] >= 0:
+            hash_idx = move
+            if not restricted and tt_depth >= depth and (flag == EXACT or 
+                    (flag == LOWER and tt_score >= beta) or 
+                    (flag == UPPER and tt_score <= alpha)):
+                return tt_score, move // board.shape[1], move % board.shape[1]
+
+    oppnent_piece = Piece.black.value + Piece.white.value - piece
+    alpha0 = alpha
+    best = -np.inf
+    best_idx = -1
+    n = cands[3][0]
+    moves = buffers[0][ply]
+    order_keys = buffers[1][ply]
+    kinds = buffers[2][ply]
+    order_moves(board, piece, cands, hash_idx, killers, history, ply, 
+                ordering, moves, order_keys, kinds)
+    if restricted:
+        m = 0
+        for i in range(n):
+            if moves[i] in root_moves:
+                moves[m] = moves[i]
+                order_keys[m] = order_keys[i]
+                kinds[m] = kinds[i]
+                m += 1
+        n = m
+    stats[STAT_INTERIOR] += 1
+    stats[STAT_CANDIDATES] += n
+    if n > stats[STAT_MAX_CANDIDATES]:
+        stats[STAT_MAX_CANDIDATES] = n
+    if ply + 1 > stats[STAT_MAX_DEPTH]:
+        stats[STAT_MAX_DEPTH] = ply + 1
+    for i in range(n):
+        pick(moves, order_keys, kinds, i, n)
+        idx = moves[i]
+        row = idx // board.shape[1]
+        col = idx % board.shape[1]
+        put(board, bits, piece, row, col)
+        stats[STAT_NODES] += 1
+        stats[STAT_MOVES] += 1
+        if stats[STAT_NODES] % TIME_CHECK_NODES == 0 and \
+                control[CTRL_DEADLINE] < np.inf:
+            with objmode(now='float64'):
+                now = time.perf_counter()
+            if now >= control[CTRL_DEADLINE]:
+                control[CTRL_STOP] = 1
+        stats[STAT_CHECKS] += 1
+        if won(board, bits, piece, row, col):
+            score = np.inf
+        elif depth > 1:
+            p = make(cands, board, row, col)
+            s, r, c = alphabeta(oppnent_piece, board, bits, cands, depth-1, 
+                                ply+1, -beta, -max(alpha, best), 
+                                h ^ keys[piece, idx], keys, table, age, 
+                                killers, history, ordering, stats, control, 
+                                root_moves, buffers)
+            unmake(cands, board, row, col, p)
+            score = -s
+        else:
+            stats[STAT_LEAVES] += 1
+            score = evaluate(board, piece)
+        take(board, bits, piece, row, col)
+        if control[CTRL_STOP] != 0:
+            return best, 0, 0
+        if score > best or best_idx < 0:
+            best = score
+            best_idx = idx
+            if best >= beta:
+                stats[STAT_CUTOFFS] += 1
+                if i == 0:
+                    stats[STAT_FIRST_CUTOFFS] += 1
+                stats[STAT_CUT_KIND + kinds[i]] += 1
+                update_heuristics(killers, history, piece, idx, kinds[i], 
+                                  ply, depth)
+                break
+
+    if best_idx < 0:
+        # no place to play, a draw.
+        return 0.0, -1, -1
+    if best <= alpha0:
+        flag = UPPER
+    elif best >= beta:
+        flag = LOWER
+    else:
+        flag = EXACT
+    tt_store(table, h, age, depth, flag, best, best_idx)
+    return best, best_idx // board.shape[1], best_idx % board.shape[1]
+
+
+def helper_search(piece: int, board: np.ndarray, bits: np.ndarray, 
+                cands: tuple, first: int, max_depth: int, h, keys: np.ndarray, 
+                table: np.ndarray, age: int, killers: np.ndarray, 
+                history: np.ndarray, ordering: int, stats: np.ndarray, 
+                control: np.ndarray, root_moves: np.ndarray):
+    """
+    Iterative deepening of a helper thread of the Lazy SMP search, or of 
+    the pondering search.
+
+    The helper searches its own copy of the board from depth `first`, 
+    to fill the shared transposition table, until `control[CTRL_STOP]` 
+    is set. see `alphabeta` for the parameters.
+
+    Returns
+    -------
+    result: tuple or None
+        (score, row, col, depth) of the deepest search finished, None if 
+        there is none.
+    """
+    result = None
+    buffers = search_buffers(board.size)
+    for depth in range(first, max_depth + 1):
+        p, row, col = alphabeta(piece, board, bits, cands, depth, 0, 
+                                -np.inf, np.inf, h, keys, table, age, 
+                                killers, history, ordering, stats, control, 
+                                root_moves, buffers)
+        if control[CTRL_STOP] != 0:
+            break
+        result = p, row, col, depth
+        if np.isinf(p):
+            break
+    return result
 
 
 class Minimax(Agent):
     def __init__(self, name: str, piece: Piece, **kwargs) -> None:
         super().__init__(name, piece, **kwargs)
+        # seconds to think for one play. when given, the search deepens 
+        # one ply at a time until the time is used up.
+        self.time_limit = kwargs.get('time_limit', None)
         if 'depth' in kwargs:
             self.depth = kwargs['depth']
+        elif self.time_limit is not None:
+            self.depth = MAX_DEPTH
         else:
             self.depth = 4
-        self.indexes = List()
+        # 'alphabeta' or 'minimax'
+        self.search = kwargs.get('search', 'alphabeta')
+        if self.search not in ('alphabeta', 'minimax'):
+            raise ValueError(f'unknown search: {self.search}')
+        # 'ndarray' or 'bitboard', the board used by the alphabeta search 
+        # for checking for winning. only the win check is on the bitboard, 
+        # the candidates and the evaluation are on the ndarray board.
+        self.backend = kwargs.get('backend', 'ndarray')
+        if self.backend not in ('ndarray', 'bitboard'):
+            raise ValueError(f'unknown backend: {self.backend}')
+        # the candidate places of the next play, kept between plays.
+        self.candidates = None
+        # the stages of move ordering, see `ordering.ordering_flags`.
+        self.ordering = ordering_flags(kwargs.get('ordering', 'all'))
+        self.killers = np.full((MAX_DEPTH + 1, NUM_KILLERS), -1, dtype=np.int32)
+        self.history = None
+        # the move ordering buffers of the search, see `search_buffers`.
+        self.buffers = None
+        # the random state of the plain minimax search, for the ties, 
+        # seeded by `seed`, None for a different state every time.
+        self.rng = new_rng(kwargs.get('seed', None))
+        self.stats = np.zeros(NUM_STATS, dtype=np.int64)
+        self.control = np.zeros(NUM_CTRLS)
+        # nodes visited by the last play.
+        self.nodes = 0
+        # depth of the deepest search finished by the last play.
+        self.depth_reached = 0
+        # the table is kept between plays of a game.
+        self.table = TranspositionTable(kwargs.get('tt_size', 1 << 20))
+        self.keys = None
+        # the threat-space search before the full search, see `threat_search`.
+        self.threats = kwargs.get('threats', True)
+        self.vcf_depth = kwargs.get('vcf_depth', 10)
+        self.vct_depth = kwargs.get('vct_depth', 2)
+        # the limits of the threat-space search of one play, not counted in 
+        # `time_limit`. `threat_time` None for no time limit, the search 
+        # stops by `threat_nodes` only.
+        self.threat_nodes = kwargs.get('threat_nodes', 20000)
+        self.threat_time = kwargs.get('threat_time', 0.2)
+        # the candidates allowed at the root of the search.
+        self.root_moves = np.empty(0, dtype=np.int32)
+        # nodes visited by the threat-space search of the last play.
+        self.threat_visited = 0
+        # the per-ply buffers of the threat-space search, see 
+        # `threat.threat_buffers`, allocated for the board of the game.
+        self.threat_buffers = None
+        # the opening book consulted before searching, a path or an 
+        # `book.OpeningBook`, and the games a play needs to be taken.
+        self.book = kwargs.get('book', None)
+        if isinstance(self.book, str):
+            self.book = OpeningBook(self.book)
+        self.book_min_count = kwargs.get('book_min_count', 2)
+        # seconds of the iterations of the last search.
+        self.iterations = []
+        # threads of the alphabeta search. the extra threads search the same 
+        # position at different depths and share the transposition table 
+        # (Lazy SMP), so the main thread finds more cutoffs in the table.
+        self.workers = kwargs.get('workers', 1)
+        # search on the opponent's time. after a play, the reply predicted 
+        # by the transposition table is searched in a thread until the next 
+        # play, which takes the ready play if the prediction is right, and 
+        # the table entries anyway.
+        self.ponder = kwargs.get('ponder', False)
+        # (thread, control, row, col, result) of the pondering search.
+        self.pondering = None
+        # plays of the game whose reply was predicted by pondering.
+        self.ponder_hits = 0
+        # max rows and cols of the window searched on a sparse board, and 
+        # (row0, col0, cols) of the window of the last play.
+        self.window = kwargs.get('window', WINDOW)
+        self.origin = None
 
-    def play(self, board: np.ndarray, last_row: int = 0, last_col=0, steps: int = 0):
-        if steps == 0:
-            self.indexes = List()
-            row = board.shape[0] // 2
-            col = board.shape[1] // 2
-        elif steps == 1:
-            self.indexes = indexes_union_init(board, last_row, last_col)
-            p, row, col = infer(self.piece.value, board, self.indexes, depth=self.depth)
+    def infer(self, board: np.ndarray, h=None):
+        self.stats[:] = 0
+        self.iterations = []
+        if self.search == 'alphabeta':
+            p, row, col = self.deepen(board, h)
         else:
-            self.indexes = indexes_union(board, self.indexes, last_row, last_col)
-            p, row, col = infer(self.piece.value, board, self.indexes, depth=self.depth)
-        board[row, col] = self.piece.value
-        if len(self.indexes) == 0:
-            self.indexes = indexes_union_init(board, row, col)
+            t = time.perf_counter()
+            p, row, col = infer(self.piece.value, board, 
+                                self.candidates.cands, self.depth, self.stats, 
+                                self.rng)
+            self.iterations.append(time.perf_counter() - t)
+            self.depth_reached = self.depth
+            self.stats[STAT_MAX_DEPTH] = self.depth
+        self.nodes = self.stats[STAT_NODES]
+        return p, row, col
+
+    def deepen(self, board: np.ndarray, h=None):
+        """
+        Iterative deepening alpha-beta search.
+
+        Search with depth 1, 2, ..., `self.depth`, the best moves saved in the 
+        table by an iteration are searched first by the next one. With 
+        `self.time_limit`, the search stops when the time is used up and the 
+        result of the deepest finished iteration is returned. `h` is the 
+        Zobrist hash of the board, None to compute it.
+        """
+        start = time.perf_counter()
+        self.table.new_search()
+        if h is None:
+            h = np.uint64(board_hash(board, self.keys))
+        if self.backend == 'bitboard':
+            bits = to_bitboard(board)
         else:
-            self.indexes = indexes_union(board, self.indexes, row, col)
+            bits = np.zeros((3, 0), dtype=np.uint64)
+        self.killers[:] = -1
+        self.history //= 2
+        # the first iteration always finishes, so there is a play to return, 
+        # unless the play is stopped by `stop`.
+        self.control[CTRL_DEADLINE] = np.inf
+        result = -np.inf, -1, -1
+        helpers = [self.start_helper(k, board, bits, h) 
+                   for k in range(1, self.workers)]
+        try:
+            for depth in range(1, self.depth + 1):
+                t = time.perf_counter()
+                p, row, col = alphabeta(self.piece.value, board, bits, 
+                                        self.candidates.cands, depth, 0, 
+                                        -np.inf, np.inf, h, self.keys, 
+                                        self.table.table, self.table.age, 
+                                        self.killers, self.history, 
+                                        self.ordering, self.stats, 
+                                        self.control, self.root_moves, 
+                                        self.buffers)
+                self.iterations.append(time.perf_counter() - t)
+                if self.control[CTRL_STOP] != 0:
+                    break
+                result = p, row, col
+                self.depth_reached = depth
+                if np.isinf(p):
+                    # won or lost, deeper search does not change it.
+                    break
+                if self.time_limit is not None:
+                    elapsed = time.perf_counter() - start
+                    # the next iteration takes longer than all the former ones.
+                    if elapsed >= self.time_limit / 2:
+                        break
+                    self.control[CTRL_DEADLINE] = start + self.time_limit
+        finally:
+            for thread, stats, control in helpers:
+                control[CTRL_STOP] = 1
+                thread.join()
+                maxima = np.maximum(self.stats, stats)
+                self.stats += stats
+                self.stats[list(MAX_STATS)] = maxima[list(MAX_STATS)]
+        return result
+
+    def start_helper(self, k: int, board: np.ndarray, bits: np.ndarray, h):
+        """
+        Start the helper thread `k` of the Lazy SMP search.
+
+        The helper has its own copies of the board, the candidates and the 
+        heuristics, the odd helpers start one ply deeper than the main 
+        thread, so the helpers do not all search the same tree.
+
+        Returns
+        -------
+        thread, stats, control: the thread, its search counters and its 
+            control array, set `control[CTRL_STOP]` to stop it.
+        """
+        stats = np.zeros(NUM_STATS, dtype=np.int64)
+        control = np.zeros(NUM_CTRLS)
+        control[CTRL_DEADLINE] = np.inf
+        cands = tuple(a.copy() for a in self.candidates.cands)
+        thread = threading.Thread(
+            target=helper_search, 
+            args=(self.piece.value, board.copy(), bits.copy(), cands, 
+                  1 + k % 2, min(self.depth + 1, MAX_DEPTH), h, self.keys, 
+                  self.table.table, self.table.age, self.killers.copy(), 
+                  self.history.copy(), self.ordering, stats, control, 
+                  self.root_moves), 
+            daemon=True)
+        thread.start()
+        return thread, stats, control
+
+    def threat_search(self, board: np.ndarray):
+        """
+        Search for forced wins by the threat-space search.
+
+        Returns the first play of a VCT of the agent if found. Otherwise, if 
+        the opponent has a VCF, `self.root_moves` is set to the candidates 
+        that stop it, so the alphabeta search only looks at them.
+
+        Returns
+        -------
+        pos: tuple_of_int or None
+            (row, col) of the play, None if not found.
+        """
+        self.root_moves = np.empty(0, dtype=np.int32)
+        self.threat_visited = 0
+        own = self.piece.value
+        opponent = Piece.black.value + Piece.white.value - own
+        limits = np.zeros(NUM_LIMITS, dtype=np.int64)
+        limits[LIMIT_MAX_NODES] = self.threat_nodes
+        deadline = np.inf if self.threat_time is None else \
+            time.perf_counter() + self.threat_time
+        buffers = self.threat_buffers
+        if buffers is None or buffers[0].shape[1] != board.size:
+            buffers = self.threat_buffers = threat_buffers(
+                self.vcf_depth + self.vct_depth + 1, board.size)
+        try:
+            idx = solve(board, own, self.vcf_depth, self.vct_depth, 
+                        limits, deadline, buffers)
+            if idx >= 0:
+                return divmod(int(idx), board.shape[1])
+            if solve(board, opponent, self.vcf_depth, 0, limits, deadline,
+                     buffers) < 0:
+                return None
+            safe = []
+            for idx in self.candidates.indexes:
+                row, col = divmod(int(idx), board.shape[1])
+                board[row, col] = own
+                lost = solve(board, opponent, self.vcf_depth, 0, limits, 
+                             deadline, buffers)
+                board[row, col] = 0
+                if limits[LIMIT_ABORTED] != 0:
+                    # not all the candidates are tried.
+                    return None
+                if lost < 0:
+                    safe.append(idx)
+            self.root_moves = np.array(safe, dtype=np.int32)
+            return None
+        finally:
+            self.threat_visited = int(limits[LIMIT_NODES])
+
+    def stop(self):
+        """
+        Stop the search in progress and the pondering, called from another 
+        thread. The play returns the best play found so far, or None if 
+        there is none.
+        """
+        self.control[CTRL_STOP] = 1
+        pondering = self.pondering
+        if pondering is not None:
+            pondering[1][CTRL_STOP] = 1
+
+    def start_ponder(self, board: np.ndarray):
+        """
+        Start searching the position after the predicted reply of the 
+        opponent, `board` is the position after the play of the agent.
+        """
+        h = np.uint64(board_hash(board, self.keys))
+        found, score, move, depth, flag = tt_probe(self.table.table, h)
+        if not found:
+            return
+        row, col = divmod(move, board.shape[1])
+        if move < 0 or board[row, col] != 0:
+            return
+        opponent = Piece.black.value + Piece.white.value - self.piece.value
+        board = board.copy()
+        board[row, col] = opponent
+        if check_value(board, opponent, row, col):
+            return
+        cands = CandidateSet(board.size)
+        cands.build(board)
+        if len(cands) == 0:
+            return
+        if self.backend == 'bitboard':
+            bits = to_bitboard(board)
+        else:
+            bits = np.zeros((3, 0), dtype=np.uint64)
+        h = np.uint64(board_hash(board, self.keys))
+        control = np.zeros(NUM_CTRLS)
+        control[CTRL_DEADLINE] = np.inf
+        result = []
+        args = (self.piece.value, board, bits, cands.cands, 1, 
+                min(self.depth, MAX_DEPTH), h, self.keys, self.table.table, 
+                self.table.age, self.killers.copy(), self.history.copy(), 
+                self.ordering, np.zeros(NUM_STATS, dtype=np.int64), control, 
+                np.empty(0, dtype=np.int32))
+        thread = threading.Thread(
+            target=lambda: result.append(helper_search(*args)), daemon=True)
+        thread.start()
+        self.pondering = thread, control, row, col, result
+
+    def stop_ponder(self, last_row: int, last_col: int):
+        """
+        Stop pondering.
+
+        Returns
+        -------
+        pos: tuple_of_int or None
+            (row, col) of the ready play, if the reply of the opponent was 
+            predicted and searched to `self.depth` or to a decided result.
+        """
+        if self.pondering is None:
+            return None
+        thread, control, row, col, result = self.pondering
+        self.pondering = None
+        control[CTRL_STOP] = 1
+        thread.join()
+        if (row, col) != (last_row, last_col):
+            return None
+        self.ponder_hits += 1
+        if not result or result[0] is None:
+            return None
+        p, row, col, depth = result[0]
+        if depth >= self.depth or np.isinf(p):
+            return row, col
+        return None
+
+    def new_game(self, grid: np.ndarray):
+        """Forget the game before, the table and the heuristics."""
+        self.table.clear()
+        self.keys = zobrist_keys(grid.shape[0], grid.shape[1])
+        self.history = np.zeros((3, grid.size), dtype=np.int64)
+        if self.buffers is None or self.buffers[0].shape[1] != grid.size:
+            self.buffers = search_buffers(grid.size)
+        self.ponder_hits = 0
+
+    def choose(self, grid: np.ndarray, ready, h=None):
+        """
+        Find the play on `grid`, whose candidates are `self.candidates`.
+
+        Parameters
+        ----------
+        ready: tuple_of_int or None
+            the play ready by pondering, see `stop_ponder`.
+        h: np.uint64
+            Zobrist hash of the board, None to compute it.
+
+        Returns
+        -------
+        row, col, source: the play and how it was found, see `play_record`. 
+            None if stopped before any play was found.
+        """
+        pos = None
+        self.threat_visited = 0
+        if self.book is not None:
+            pos = self.book.probe(grid, self.book_min_count)
+            source = 'book'
+        if pos is None and len(self.candidates) == 0:
+            pos = grid.shape[0] // 2, grid.shape[1] // 2
+            source = 'center'
+        elif pos is None:
+            if self.threats:
+                pos = self.threat_search(grid)
+                source = 'threat'
+            if pos is None and ready is not None and (
+                    self.root_moves.shape[0] == 0 or 
+                    ready[0] * grid.shape[1] + ready[1] in self.root_moves):
+                pos = ready
+                source = 'ponder'
+        if pos is not None:
+            row, col = pos
+            self.stats[:] = 0
+            self.nodes = 0
+            self.depth_reached = 0
+            self.iterations = []
+        else:
+            p, row, col = self.infer(grid, h)
+            source = 'search'
+            if row < 0:
+                return None
+        return row, col, source
+
+    def play(self, board: np.ndarray, last_row: int = 0, last_col=0, steps: int = 0):
+        start = time.perf_counter()
+        ready = self.stop_ponder(last_row, last_col)
+        self.control[CTRL_STOP] = 0
+        # search on an int8 copy, so the njit functions are compiled and 
+        # cached for one board type, whatever the type of `board` is.
+        grid = board.astype(np.int8)
+        # black starts a game at step 0, and white at step 1.
+        if steps < 2 or self.candidates is None or \
+                self.keys.shape[1] != grid.size:
+            self.new_game(grid)
+            self.candidates = CandidateSet(grid.size)
+            self.candidates.build(grid)
+            ready = None
+        elif grid[last_row, last_col] != 0:
+            self.candidates.make(grid, last_row, last_col)
+        root_candidates = len(self.candidates)
+        choice = self.choose(grid, ready)
+        if choice is None:
+            return None
+        row, col, source = choice
+        board[row, col] = self.piece.value
+        grid[row, col] = self.piece.value
+        self.candidates.make(grid, row, col)
+        if self.ponder:
+            self.start_ponder(grid)
+        if self.on_stats is not None:
+            self.on_stats(self, self.play_record(
+                row, col, steps, source, root_candidates, 
+                time.perf_counter() - start))
+        return row, col
+
+    def play_position(self, position):
+        """
+        Play on a `position.Position`, the search runs on the board, the 
+        candidates and the hash of the position, none of them is copied or 
+        rebuilt. A game is played either by `play` or by `play_position`.
+        """
+        start = time.perf_counter()
+        last_row, last_col = position.last
+        ready = self.stop_ponder(last_row, last_col)
+        self.control[CTRL_STOP] = 0
+        grid = position.board
+        if position.steps < 2 or self.keys is None or \
+                self.keys.shape[1] != grid.size:
+            self.new_game(grid)
+            ready = None
+        self.keys = position.keys
+        self.candidates = position.candidates
+        root_candidates = len(self.candidates)
+        choice = self.choose(grid, ready, position.hash)
+        if choice is None:
+            return None
+        row, col, source = choice
+        if self.ponder:
+            position.make(row, col, self.piece.value)
+            self.start_ponder(position.board)
+            position.unmake()
+        if self.on_stats is not None:
+            self.on_stats(self, self.play_record(
+                row, col, position.steps, source, root_candidates, 
+                time.perf_counter() - start))
+        return row, col
+
+    def play_sparse(self, board):
+        """
+        Play on a `sparse.SparseBoard`.
+
+        The search runs on the window of at most `self.window` by 
+        `self.window` cells around the last play, see `SparseBoard.window`. 
+        The Zobrist keys are the ones of the board coordinates (see 
+        `transposition.coordinate_keys`), and the plays of the table are 
+        moved with the window, so the table is kept between the plays. 
+        Pondering is not used.
+        """
+        start = time.perf_counter()
+        self.stop_ponder(-1, -1)
+        self.control[CTRL_STOP] = 0
+        grid, row0, col0 = board.window(size=self.window)
+        if board.steps < 2 or self.origin is None:
+            self.table.clear()
+            self.ponder_hits = 0
+        elif self.origin != (row0, col0, grid.shape[1]):
+            old_row0, old_col0, old_cols = self.origin
+            self.table.shift(old_cols, grid.shape[0], grid.shape[1], 
+                             old_row0 - row0, old_col0 - col0)
+        self.origin = row0, col0, grid.shape[1]
+        self.keys = coordinate_keys(row0, col0, grid.shape[0], grid.shape[1])
+        if self.history is None or self.history.shape[1] != grid.size:
+            self.history = np.zeros((3, grid.size), dtype=np.int64)
+        # the buffers hold any window up to the largest one.
+        if self.buffers is None or self.buffers[0].shape[1] < grid.size:
+            self.buffers = search_buffers(grid.size)
+        self.candidates = CandidateSet(grid.size)
+        self.candidates.build(grid)
+        root_candidates = len(self.candidates)
+        choice = self.choose(grid, None)
+        if choice is None:
+            return None
+        row, col, source = choice
+        row, col = int(row) + row0, int(col) + col0
+        if self.on_stats is not None:
+            self.on_stats(self, self.play_record(
+                row, col, board.steps, source, root_candidates, 
+                time.perf_counter() - start))
         return row, col
 
+    def play_record(self, row: int, col: int, steps: int, source: str, 
+                    root_candidates: int, seconds: float) -> dict:
+        """
+        The statistics record of the last play.
+
+        Parameters
+        ----------
+        source: str
+            how the play was found: 'center', 'book', 'threat', 'ponder' 
+            or 'search'.
+        root_candidates: int
+            candidates of the position.
+        seconds: float
+            wall time of the play.
+        """
+        s = self.stats
+        return {
+            'name': self.name,
+            'step': steps,
+            'move': (int(row), int(col)),
+            'source': source,
+            'seconds': seconds,
+            'nodes': int(s[STAT_NODES]),
+            'leaves': int(s[STAT_LEAVES]),
+            'checks': int(s[STAT_CHECKS]),
+            'depth': self.depth_reached,
+            'max_depth': int(s[STAT_MAX_DEPTH]),
+            'cutoffs': int(s[STAT_CUTOFFS]),
+            'first_cutoff_rate': float(s[STAT_FIRST_CUTOFFS] / 
+                                       max(1, s[STAT_CUTOFFS])),
+            'tt_hit_rate': float(s[STAT_TT_HITS] / max(1, s[STAT_TT_PROBES])),
+            'root_candidates': root_candidates,
+            'mean_candidates': float(s[STAT_CANDIDATES] / 
+                                     max(1, s[STAT_INTERIOR])),
+            'max_candidates': int(s[STAT_MAX_CANDIDATES]),
+            'iterations': list(self.iterations),
+            'threat_nodes': self.threat_visited,
+            'ponder_hits': self.ponder_hits,
+        }
+
+
+def warm_up(size: int = 15):
+    """
+    Load the compiled search from the numba cache, or compile it and save 
+    it to the cache when it is the first run.
+
+    A host process can call it before the first play of a game, so the 
+    first play is not slowed down. The cache is compiled again after any 
+    change of the engine sources, see `jitcache.py`, and the caches of the 
+    former sources are removed here.
+    """
+    remove_stale()
+    board = np.zeros((size, size), dtype=np.int8)
+    players = [Minimax('black', Piece.black, depth=2, tt_size=1 << 10), 
+               Minimax('white', Piece.white, depth=2, tt_size=1 << 10, 
+                       search='minimax')]
+    row, col = -1, -1
+    for steps in range(4):
+        row, col = players[steps % 2].play(board, row, col, steps)
+    check(board, Piece.black, row, col)
+
 
 if __name__ == '__main__':
     board = np.zeros((9,9), dtype=np.int32)
@@ -112,18 +912,14 @@ if __name__ == '__main__':
     row = -1
     col= -1
     steps = 0
-    while(True):
-        row, col = player0.play(board, row, col, steps)
+    while(steps < board.size):
+        player = [player0, player1][steps % 2]
+        row, col = player.play(board, row, col, steps)
         show_board(board)
         steps += 1
-        won, pos = check(board, player0.piece, row, col)
-        if won == True:
-            print("black won! ", pos)
+        winning, pos = check(board, player.piece, row, col)
+        if winning == True:
+            print(f"{player.name} won! ", pos)
             break
-        row, col = player1.play(board, row, col, steps)
-        show_board(board)
-        steps += 1
-        won, pos = check(board, player0.piece, row, col)
-        if won == True:
-            print("white won! ", pos)
-            break
\ No newline at end of file
+    else:
+        print("No one won.")
@@ -0,0 +1,258 @@
+"""
+Move ordering of the alpha-beta search.
+
+The candidates of a node are searched in the order:
+
+1. the best move saved in the transposition table;
+2. tactical moves: the moves that make five, then the moves that stop a
+   five of the opponent;
+3. threat moves: the moves that make or stop a live three or better, the
+   killers first, then by the pattern score of the move and the history
+   table;
+4. killer moves: the other moves that cut off a sibling node at the same
+   ply;
+5. quiet moves, by the history table and the pattern score.
+
+The killers and the history are saved by every cutoff move but the hash
+move and the tactical moves.
+
+Every stage except the first can be switched off by the `ordering` flags.
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import numpy as np
+from jitcache import njit
+from evaluation import (CENTER, DIRECTIONS, FIVE, LIVE_THREE, OWN,
+                        PATTERN_SCORES, PATTERN_TYPE, window_code)
+
+# ordering flags.
+ORDER_TACTICAL = 1
+ORDER_PATTERN = 2
+ORDER_KILLER = 4
+ORDER_HISTORY = 8
+ORDER_ALL = ORDER_TACTICAL | ORDER_PATTERN | ORDER_KILLER | ORDER_HISTORY
+
+ORDER_STAGES = {
+    'tactical': ORDER_TACTICAL,
+    'pattern': ORDER_PATTERN,
+    'killer': ORDER_KILLER,
+    'history': ORDER_HISTORY,
+}
+
+# kinds of the moves, in the searching order.
+KIND_HASH = 0
+KIND_TACTICAL = 1
+KIND_THREAT = 2
+KIND_KILLER = 3
+KIND_QUIET = 4
+NUM_KINDS = 5
+
+# killer moves saved per ply.
+NUM_KILLERS = 2
+# the pattern score of a move to be a threat.
+THREAT_SCORE = PATTERN_SCORES[LIVE_THREE]
+
+# added to the score of a threat move that is a killer, above any pattern
+# score.
+KILLER_BONUS = 1e6
+# the key of a move is `tier * TIER + score`.
+TIER = 1e12
+TIER_HASH = 5
+TIER_WIN = 4
+TIER_BLOCK = 3
+TIER_THREAT = 2
+TIER_KILLER = 1
+
+
+def ordering_flags(stages) -> int:
+    """
+    Convert the names of the stages to the ordering flags.
+
+    Parameters
+    ----------
+    stages: int, str or iterable of str
+        the flags, 'all', 'none', or names in `ORDER_STAGES`.
+    """
+    if isinstance(stages, (int, np.integer)):
+        return int(stages)
+    if stages == 'all':
+        return ORDER_ALL
+    if stages == 'none':
+        return 0
+    if isinstance(stages, str):
+        stages = [stages]
+    flags = 0
+    for name in stages:
+        if name not in ORDER_STAGES:
+            raise ValueError(f'unknown ordering stage: {name}')
+        flags |= ORDER_STAGES[name]
+    return flags
+
+
+@njit(cache=True)
+def place_pattern(board: np.ndarray, value: int, row: int, col: int):
+    """
+    Pattern of putting the piece of `value` at the blank (row, col).
+
+    Returns
+    -------
+    best: int
+        the best pattern type of the 4 directions.
+    score: float
+        the sum of the pattern scores of the 4 directions.
+    """
+    best = 0
+    score = 0.0
+    for d in range(4):
+        code = window_code(board, value, row, col,
+                           DIRECTIONS[d, 0], DIRECTIONS[d, 1])
+        t = PATTERN_TYPE[code + OWN * 3 ** CENTER]
+        if t > best:
+            best = t
+        score += PATTERN_SCORES[t]
+    return best, score
+
+
+@njit(cache=True)
+def order_moves(board: np.ndarray, piece: int, cands: tuple, hash_idx: int,
+                killers: np.ndarray, history: np.ndarray, ply: int,
+                ordering: int, moves: np.ndarray, keys: np.ndarray,
+                kinds: np.ndarray):
+    """
+    Fill the candidates and their ordering keys.
+
+    Parameters
+    ----------
+    moves, keys, kinds: np.ndarray
+        output, the candidates, their keys and kinds, no shorter than the
+        candidate set.
+
+    Returns
+    -------
+    n: int
+        number of the moves.
+    """
+    dense = cands[2]
+    n = cands[3][0]
+    opponent = 3 - piece
+    cols = board.shape[1]
+    for i in range(n):
+        idx = dense[i]
+        moves[i] = idx
+        if idx == hash_idx:
+            keys[i] = TIER_HASH * TIER
+            kinds[i] = KIND_HASH
+            continue
+        row = idx // cols
+        col = idx % cols
+        tier = 0
+        score = 0.0
+        kind = KIND_QUIET
+        if ordering & (ORDER_TACTICAL | ORDER_PATTERN):
+            attack, attack_score = place_pattern(board, piece, row, col)
+            defend, defend_score = place_pattern(board, opponent, row, col)
+            if ordering & ORDER_TACTICAL and attack == FIVE:
+                tier = TIER_WIN
+                kind = KIND_TACTICAL
+            elif ordering & ORDER_TACTICAL and defend == FIVE:
+                tier = TIER_BLOCK
+                kind = KIND_TACTICAL
+            elif ordering & ORDER_PATTERN:
+                score = attack_score + defend_score
+                if attack_score >= THREAT_SCORE or defend_score >= THREAT_SCORE:
+                    tier = TIER_THREAT
+                    kind = KIND_THREAT
+        killer = -1
+        if ordering & ORDER_KILLER:
+            for k in range(NUM_KILLERS):
+                if killers[ply, k] == idx:
+                    killer = k
+                    break
+        if tier == TIER_THREAT:
+            # the killers go first, then the history breaks the ties of the
+            # pattern scores, which are integers, by a fraction below 1.
+            if killer >= 0:
+                score += KILLER_BONUS * (NUM_KILLERS - killer)
+                kind = KIND_KILLER
+            if ordering & ORDER_HISTORY:
+                h = history[piece, idx]
+                score += 0.25 * h / (h + 1.0)
+        elif tier == 0 and killer >= 0:
+            tier = TIER_KILLER
+            kind = KIND_KILLER
+            score = NUM_KILLERS - killer
+        if tier == 0 and ordering & ORDER_HISTORY:
+            score += history[piece, idx]
+        keys[i] = tier * TIER + score
+        kinds[i] = kind
+    return n
+
+
+@njit(cache=True)
+def pick(moves: np.ndarray, keys: np.ndarray, kinds: np.ndarray, i: int,
+        n: int):
+    """Move the move with the largest key in [i, n) to i."""
+    best = i
+    for k in range(i + 1, n):
+        if keys[k] > keys[best]:
+            best = k
+    if best != i:
+        moves[i], moves[best] = moves[best], moves[i]
+        keys[i], keys[best] = keys[best], keys[i]
+        kinds[i], kinds[best] = kinds[best], kinds[i]
+
+
+@njit(cache=True)
+def update_heuristics(killers: np.ndarray, history: np.ndarray, piece: int,
+                    idx: int, kind: int, ply: int, depth: int):
+    """
+    Save the move that cut off the search to the killers and history. The 
+    hash move and the tactical moves are always searched first, they are 
+    not killers.
+    """
+    if kind != KIND_HASH and kind != KIND_TACTICAL:
+        if killers[ply, 0] != idx:
+            for k in range(NUM_KILLERS - 1, 0, -1):
+                killers[ply, k] = killers[ply, k - 1]
+            killers[ply, 0] = idx
+    history[piece, idx] += depth * depth
+
+
+def measure(depth: int = 4, configs=('none', ['tactical'],
+            ['tactical', 'pattern'], ['tactical', 'pattern', 'killer'],
+            'all')):
+    """
+    Search the positions of `positions.SUITE` with the ordering configs.
+
+    Prints the total nodes, the moves searched per interior node (the
+    branching factor seen by the search), the rate of cutoffs by the first
+    move, and the cutoffs by the kind of move.
+    """
+    import time
+    from minimax import (Minimax, STAT_CUT_KIND, STAT_CUTOFFS,
+                         STAT_FIRST_CUTOFFS, STAT_INTERIOR, STAT_MOVES,
+                         STAT_NODES)
+    from positions import SUITE, setup
+    from utils import Piece
+    print(f'{"ordering":>36} {"nodes":>9} {"moves/node":>10} '
+          f'{"first cut":>9} {"seconds":>8}  cuts by hash/tactical/threat/killer/quiet')
+    for config in configs:
+        total = np.zeros(STAT_CUT_KIND + NUM_KINDS, dtype=np.int64)
+        t = time.perf_counter()
+        for position in SUITE:
+            board, row, col, steps = setup(position)
+            piece = Piece.black if steps % 2 == 0 else Piece.white
+            player = Minimax('player', piece, depth=depth, ordering=config)
+            player.play(board, row, col, steps)
+            total += player.stats
+        t = time.perf_counter() - t
+        name = config if isinstance(config, str) else '+'.join(config)
+        cuts = '/'.join(str(x) for x in total[STAT_CUT_KIND:])
+        print(f'{name:>36} {total[STAT_NODES]:>9} '
+              f'{total[STAT_MOVES] / total[STAT_INTERIOR]:>10.2f} '
+              f'{total[STAT_FIRST_CUTOFFS] / max(1, total[STAT_CUTOFFS]):>9.1%} '
+              f'{t:>8.2f}  {cuts}')
+
+
+if __name__ == '__main__':
+    measure()
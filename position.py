@@ -0,0 +1,202 @@
+"""
+The position of a game, shared by the agents and the games.
+
+`Position` keeps, besides the int8 board, everything that follows the plays
+and is otherwise recomputed from the board by every play:
+
+- the move stack, so a play is unmade in O(1) without the caller keeping
+  anything.
+- the Zobrist hash (see `transposition.py`), updated by every play.
+- the candidate set (see `candidates.py`), the blanks next to a stone.
+- the set of the blanks, for the random plays.
+
+`make` and `unmake` touch a constant number of cells, and are done by njit
+functions on the arrays, like the search does.
+
+An agent playing by `Agent.play_position` reads the position and may make
+and unmake plays on it while thinking, it returns with the position as it
+was, the play is made by the game.
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import numpy as np
+from jitcache import njit
+from candidates import CandidateSet, cand_remove, make, unmake
+from transposition import zobrist_keys
+from utils import Piece, check_value
+
+
+@njit(cache=True)
+def blank_restore(blanks: tuple, idx: int, p: int):
+    """Undo `cand_remove(blanks, idx)`, `p` is the value it returned."""
+    count, pos, dense, size = blanks
+    # the cell moved to p goes back to the end.
+    if p < size[0]:
+        moved = dense[p]
+        dense[size[0]] = moved
+        pos[moved] = size[0]
+    dense[p] = idx
+    pos[idx] = p
+    size[0] += 1
+
+
+@njit(cache=True)
+def position_make(board: np.ndarray, keys: np.ndarray, h: np.ndarray,
+                  cands: tuple, blanks: tuple, row: int, col: int, value: int):
+    """
+    Put a stone of `value` on the blank (row, col).
+
+    Returns
+    -------
+    p, q: int
+        the values to pass to `position_unmake`.
+    """
+    idx = row * board.shape[1] + col
+    board[row, col] = value
+    h[0] ^= keys[value, idx]
+    p = make(cands, board, row, col)
+    q = cand_remove(blanks, idx)
+    return p, q
+
+
+@njit(cache=True)
+def position_unmake(board: np.ndarray, keys: np.ndarray, h: np.ndarray,
+                    cands: tuple, blanks: tuple, row: int, col: int,
+                    p: int, q: int):
+    """Take the stone at (row, col) away, undo `position_make`."""
+    idx = row * board.shape[1] + col
+    unmake(cands, board, row, col, p)
+    blank_restore(blanks, idx, q)
+    h[0] ^= keys[board[row, col], idx]
+    board[row, col] = 0
+
+
+class Position:
+    def __init__(self, rows: int, cols: int, keys: np.ndarray = None) -> None:
+        """
+        An empty position.
+
+        Parameters
+        ----------
+        rows, cols: int
+            board size.
+        keys: np.ndarray
+            the Zobrist keys, by default `transposition.zobrist_keys(rows,
+            cols)`, the keys of `Minimax`, so the hash is the one of its
+            transposition table.
+        """
+        self.rows = rows
+        self.cols = cols
+        self.board = np.zeros((rows, cols), dtype=np.int8)
+        self.keys = zobrist_keys(rows, cols) if keys is None else keys
+        self.h = np.zeros(1, dtype=np.uint64)
+        self.candidates = CandidateSet(rows * cols)
+        # the blanks, in the same arrays as the candidates, count is unused.
+        self.blank_set = (np.zeros(rows * cols, dtype=np.int32),
+                          np.arange(rows * cols, dtype=np.int32),
+                          np.arange(rows * cols, dtype=np.int32),
+                          np.full(1, rows * cols, dtype=np.int32))
+        # the move stack, row * cols + col of the plays, and the values to
+        # unmake them.
+        self.stack = np.empty(rows * cols, dtype=np.int32)
+        self.undo = np.empty((rows * cols, 2), dtype=np.int32)
+        self.steps = 0
+
+    @property
+    def size(self):
+        return self.board.size
+
+    @property
+    def hash(self):
+        """Zobrist hash of the board."""
+        return self.h[0]
+
+    @property
+    def moves(self) -> np.ndarray:
+        """row * cols + col of the plays, the first first."""
+        return self.stack[:self.steps]
+
+    @property
+    def last(self):
+        """(row, col) of the last play, (-1, -1) if there is none."""
+        if self.steps == 0:
+            return -1, -1
+        return divmod(int(self.stack[self.steps - 1]), self.cols)
+
+    @property
+    def to_move(self):
+        """enum value of the piece to play, black plays first."""
+        return Piece.black.value if self.steps % 2 == 0 else Piece.white.value
+
+    @property
+    def blanks(self) -> np.ndarray:
+        """row * cols + col of the blanks, a view, in no order."""
+        return self.blank_set[2][:self.blank_set[3][0]]
+
+    def make(self, row: int, col: int, value: int = None):
+        """Play at the blank (row, col), by the piece to play by default."""
+        if value is None:
+            value = self.to_move
+        p, q = position_make(self.board, self.keys, self.h,
+                             self.candidates.cands, self.blank_set,
+                             row, col, value)
+        self.stack[self.steps] = row * self.cols + col
+        self.undo[self.steps] = p, q
+        self.steps += 1
+
+    def unmake(self):
+        """
+        Take the last play back.
+
+        Returns
+        -------
+        row, col: the play taken back.
+        """
+        self.steps -= 1
+        row, col = divmod(int(self.stack[self.steps]), self.cols)
+        p, q = self.undo[self.steps]
+        position_unmake(self.board, self.keys, self.h, self.candidates.cands,
+                        self.blank_set, row, col, p, q)
+        return row, col
+
+    def won(self, pieces_in_line: int = 5):
+        """True if the last play makes `pieces_in_line` in a row."""
+        if self.steps == 0:
+            return False
+        row, col = self.last
+        return check_value(self.board, self.board[row, col], row, col,
+                           pieces_in_line)
+
+    def full(self):
+        """True if there is no blank."""
+        return self.steps == self.board.size
+
+    def clear(self):
+        """Take all the plays back, in O(board size)."""
+        self.board[:, :] = 0
+        self.h[0] = 0
+        count, pos, dense, size = self.candidates.cands
+        count[:] = 0
+        pos[:] = -1
+        size[0] = 0
+        count, pos, dense, size = self.blank_set
+        pos[:] = np.arange(self.board.size)
+        dense[:] = np.arange(self.board.size)
+        size[0] = self.board.size
+        self.steps = 0
+
+    def copy(self):
+        """A copy to think on in another thread, the keys are shared."""
+        position = Position.__new__(Position)
+        position.rows = self.rows
+        position.cols = self.cols
+        position.board = self.board.copy()
+        position.keys = self.keys
+        position.h = self.h.copy()
+        position.candidates = CandidateSet(0)
+        position.candidates.cands = tuple(a.copy() for a in self.candidates.cands)
+        position.blank_set = tuple(a.copy() for a in self.blank_set)
+        position.stack = self.stack.copy()
+        position.undo = self.undo.copy()
+        position.steps = self.steps
+        return position
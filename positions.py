@@ -0,0 +1,126 @@
+"""
+Fixed positions for measuring the search.
+
+A position is a tuple of (name, board size, plays), the plays are (row, col)
+from the start of the game, black first.
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import numpy as np
+
+# positions in the middle of Minimax games on the 15x15 board.
+SUITE = [
+    ('game0-8', 15, [
+        (9, 8), (8, 9), (7, 8), (8, 8), (8, 7), (7, 9), (6, 9), (9, 6)]),
+    ('game0-16', 15, [
+        (9, 8), (8, 9), (7, 8), (8, 8), (8, 7), (7, 9), (6, 9), (9, 6),
+        (10, 9), (7, 6), (5, 10), (4, 11), (11, 10), (12, 11), (6, 10), (10, 6)]),
+    ('game0-24', 15, [
+        (9, 8), (8, 9), (7, 8), (8, 8), (8, 7), (7, 9), (6, 9), (9, 6),
+        (10, 9), (7, 6), (5, 10), (4, 11), (11, 10), (12, 11), (6, 10), (10, 6),
+        (8, 6), (9, 7), (11, 5), (9, 5), (6, 11), (6, 8), (4, 9), (7, 12)]),
+    ('game1-10', 15, [
+        (9, 6), (5, 6), (6, 9), (7, 8), (6, 7), (6, 6), (7, 6), (5, 8),
+        (8, 5), (5, 7)]),
+    ('game2-12', 15, [
+        (9, 5), (7, 9), (5, 8), (6, 8), (5, 7), (5, 9), (8, 4), (6, 9),
+        (4, 9), (4, 10), (7, 7), (3, 11)]),
+    ('game2-18', 15, [
+        (9, 5), (7, 9), (5, 8), (6, 8), (5, 7), (5, 9), (8, 4), (6, 9),
+        (4, 9), (4, 10), (7, 7), (3, 11), (2, 12), (8, 9), (9, 9), (6, 10),
+        (6, 7), (3, 10)]),
+    ('game3-10', 15, [
+        (5, 7), (9, 6), (6, 6), (4, 8), (4, 6), (6, 8), (5, 6), (7, 6),
+        (5, 8), (5, 9)]),
+    ('game3-20', 15, [
+        (5, 7), (9, 6), (6, 6), (4, 8), (4, 6), (6, 8), (5, 6), (7, 6),
+        (5, 8), (5, 9), (5, 5), (5, 4), (7, 7), (4, 4), (8, 7), (6, 7),
+        (8, 8), (9, 9), (8, 9), (8, 6)]),
+    ('game3-30', 15, [
+        (5, 7), (9, 6), (6, 6), (4, 8), (4, 6), (6, 8), (5, 6), (7, 6),
+        (5, 8), (5, 9), (5, 5), (5, 4), (7, 7), (4, 4), (8, 7), (6, 7),
+        (8, 8), (9, 9), (8, 9), (8, 6), (8, 10), (8, 11), (6, 4), (3, 7),
+        (2, 6), (3, 6), (7, 3), (8, 2), (6, 10), (3, 5)]),
+]
+
+# tactical puzzles, (name, board size, plays, solutions). the solutions are
+# the plays that win fastest, or the only plays that do not lose. (11, 2),
+# (11, 3), (11, 4) is an open three of white, so black has no time for slow
+# plays. the solutions of the VCF puzzles are the first plays of all the
+# VCFs found by `threat.vcf`.
+PUZZLES = [
+    ('five', 15, [
+        (7, 5), (8, 5), (7, 6), (8, 6), (7, 7), (8, 7), (7, 8), (6, 9)],
+        [(7, 4), (7, 9)]),
+    ('block-four', 15, [
+        (8, 3), (8, 4), (0, 0), (8, 5), (14, 14), (8, 6), (0, 14), (8, 7)],
+        [(8, 8)]),
+    ('defend-three', 15, [
+        (0, 0), (7, 6), (0, 14), (7, 7), (14, 0), (7, 8)],
+        [(7, 4), (7, 5), (7, 9), (7, 10)]),
+    ('live-four', 15, [
+        (7, 6), (11, 2), (7, 7), (11, 3), (7, 8), (11, 4)],
+        [(7, 5), (7, 9)]),
+    ('four-three', 15, [
+        (7, 5), (7, 4), (7, 6), (11, 2), (7, 7), (11, 3), (5, 8), (11, 4),
+        (6, 8), (0, 0)],
+        [(7, 8)]),
+    ('vcf', 15, [
+        (5, 4), (5, 3), (5, 5), (4, 3), (5, 6), (8, 7), (6, 7), (11, 2),
+        (7, 7), (11, 3), (4, 4), (11, 4), (4, 5), (0, 12), (4, 6), (0, 0)],
+        [(2, 3), (3, 3), (3, 4), (4, 7), (4, 8), (5, 7), (5, 8), (6, 6),
+         (7, 8), (8, 8), (8, 9)]),
+    # VCF of Minimax games, where the opponent threatens first.
+    ('game14-26', 15, [
+        (8, 5), (6, 9), (9, 6), (7, 4), (7, 6), (9, 4), (8, 6), (6, 6),
+        (8, 4), (8, 3), (8, 7), (8, 8), (6, 5), (9, 8), (5, 5), (7, 5),
+        (5, 4), (4, 3), (5, 7), (5, 8), (5, 3), (5, 6), (5, 2), (5, 1),
+        (7, 7), (4, 7)],
+        [(9, 7), (10, 6)]),
+    ('game18-25', 15, [
+        (8, 7), (9, 7), (9, 6), (7, 8), (7, 6), (8, 6), (9, 8), (6, 5),
+        (7, 5), (6, 8), (10, 9), (11, 10), (10, 7), (7, 7), (9, 5), (6, 7),
+        (6, 6), (8, 9), (5, 6), (5, 9), (4, 10), (7, 9), (6, 9), (4, 8),
+        (8, 8)],
+        [(3, 8), (5, 8), (7, 11), (9, 10), (10, 11)]),
+    ('game20-31', 15, [
+        (8, 9), (6, 7), (8, 10), (8, 8), (9, 9), (5, 8), (10, 8), (7, 11),
+        (7, 9), (6, 9), (6, 8), (5, 7), (10, 9), (11, 9), (10, 10), (10, 7),
+        (7, 10), (9, 10), (6, 11), (5, 12), (11, 7), (12, 6), (9, 11), (10, 12),
+        (8, 12), (5, 6), (5, 9), (7, 6), (4, 9), (7, 7), (8, 7)],
+        [(3, 7), (4, 7), (5, 4), (5, 5), (8, 5), (9, 4)]),
+    ('game23-26', 15, [
+        (9, 8), (5, 5), (8, 8), (7, 8), (8, 7), (8, 9), (10, 9), (7, 6),
+        (11, 10), (12, 11), (9, 10), (7, 7), (7, 9), (7, 5), (7, 4), (4, 5),
+        (8, 5), (5, 6), (6, 7), (5, 4), (5, 7), (6, 3), (7, 2), (6, 5),
+        (3, 5), (6, 4)],
+        [(6, 8), (8, 6)]),
+    ('game28-39', 15, [
+        (8, 9), (9, 9), (9, 8), (7, 10), (7, 8), (8, 8), (9, 10), (6, 7),
+        (10, 10), (10, 11), (8, 7), (11, 10), (6, 9), (5, 10), (7, 6), (6, 5),
+        (9, 6), (10, 5), (6, 6), (8, 6), (7, 5), (7, 7), (5, 7), (8, 4),
+        (4, 8), (3, 9), (6, 8), (12, 9), (13, 8), (9, 12), (8, 13), (3, 8),
+        (4, 6), (7, 9), (3, 5), (2, 4), (5, 6), (3, 6), (5, 5)],
+        [(3, 10)]),
+]
+
+
+def setup(position, dtype=np.int32):
+    """
+    Put the plays of the position, or the puzzle, on a new board.
+
+    Returns
+    -------
+    board: np.ndarray
+        the game board.
+    last_row, last_col: int
+        the last play.
+    steps: int
+        the number of plays, the player to play is black if it is even.
+    """
+    name, size, plays = position[:3]
+    board = np.zeros((size, size), dtype=dtype)
+    for i, (row, col) in enumerate(plays):
+        board[row, col] = i % 2 + 1
+    last_row, last_col = plays[-1]
+    return board, last_row, last_col, len(plays)
@@ -5,7 +5,6 @@ The RandomAgent Just randomly place a piece in a blank position.
 
 Copyright (c) 2022 falwat, under MIT License.
 """
-from secrets import choice
 import numpy as np
 from utils import Piece
 from agent import Agent
@@ -14,13 +13,22 @@ from agent import Agent
 class RandomAgent(Agent):
     def __init__(self, name: str, piece: Piece, **kwargs) -> None:
         super().__init__(name, piece, **kwargs)
+        # seed of the random plays, None for a different game every time.
+        self.rng = np.random.default_rng(kwargs.get('seed', None))
 
     def play(self, board: np.ndarray, last_row: int = 0, last_col=0, steps: int = 0):
         """
         Just randomly place a piece in a blank position.
         """
         pos = np.nonzero(board == 0)
-        i = choice(range(pos[0]))
+        i = self.rng.integers(len(pos[0]))
         row = pos[0][i]
         col = pos[1][i]
         return row, col
+
+    def play_position(self, position):
+        """
+        Randomly choose a blank of the position's set of blanks, O(1).
+        """
+        blanks = position.blanks
+        return divmod(int(blanks[self.rng.integers(len(blanks))]), position.cols)
@@ -0,0 +1,196 @@
+"""
+Sparse board for large and unbounded games.
+
+`SparseBoard` keeps the stones in a dict {(row, col): value} and their
+bounding box, so its memory grows with the number of stones, not with the
+area of the board. The rows and the cols may be
+unbounded, then any int is a place, negative ones too.
+
+The win is checked by walking the dict from the last play. The agents play
+on `window`, a dense int8 array of the bounding box and `MARGIN` blanks
+around it, which holds every place whose patterns (see `evaluation.py`)
+involve a stone, cut to `WINDOW` by `WINDOW` cells around the last play
+when it is larger, so the memory of a play is bounded whatever the spread
+of the stones, see `Agent.play_sparse`.
+
+It has the methods of `position.Position` used by `gobang_cli.Game`:
+`make`, `unmake`, `won`, `full`, `clear`, `steps` and `last`.
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import numpy as np
+from utils import Piece
+
+# blanks around the bounding box in the window, the reach of a pattern.
+MARGIN = 4
+# max rows and cols of the window the agents play on.
+WINDOW = 19
+DIRECTIONS = ((0, 1), (1, 0), (1, 1), (1, -1))
+
+
+def cut(lo: int, hi: int, at: int, size: int, length: int):
+    """
+    One axis of a window: [lo, hi), or `size` cells around `at` in it if 
+    it is longer, then cut to [0, length) if `length` is not None.
+    """
+    if size is not None and hi - lo > size:
+        lo = min(max(lo, at - size // 2), hi - size)
+        hi = lo + size
+    if length is not None:
+        lo, hi = max(lo, 0), min(hi, length)
+    return lo, hi
+
+
+def check_stones(stones: dict, value: int, row: int, col: int,
+                 pieces_in_line: int = 5):
+    """
+    Check for winning around the last piece, on the stones of a dict.
+
+    Only the stones within `pieces_in_line - 1` from (row, col) in the
+    4 directions are looked up.
+    """
+    for dr, dc in DIRECTIONS:
+        n = 1
+        for side in (-1, 1):
+            for k in range(1, pieces_in_line):
+                if stones.get((row + side * k * dr, col + side * k * dc)) != value:
+                    break
+                n += 1
+        if n >= pieces_in_line:
+            return True
+    return False
+
+
+class SparseBoard:
+    def __init__(self, rows: int = None, cols: int = None) -> None:
+        """
+        An empty sparse board.
+
+        Parameters
+        ----------
+        rows, cols: int
+            board size, None for unbounded. the center is (rows // 2,
+            cols // 2), or 0 if unbounded.
+        """
+        self.rows = rows
+        self.cols = cols
+        self.stones = {}
+        # (row, col) of the plays, the move stack.
+        self.moves = []
+        # the bounding box of the stones, and the boxes before the plays
+        # that grew it, to restore them by `unmake`.
+        self.box = None
+        self.boxes = []
+
+    @property
+    def steps(self):
+        return len(self.moves)
+
+    @property
+    def last(self):
+        """(row, col) of the last play, (-1, -1) if there is none."""
+        return self.moves[-1] if self.moves else (-1, -1)
+
+    @property
+    def to_move(self):
+        """enum value of the piece to play, black plays first."""
+        return Piece.black.value if len(self.moves) % 2 == 0 else Piece.white.value
+
+    @property
+    def center(self):
+        return (0 if self.rows is None else self.rows // 2,
+                0 if self.cols is None else self.cols // 2)
+
+    def inside(self, row: int, col: int):
+        """True if (row, col) is on the board."""
+        return (self.rows is None or 0 <= row < self.rows) and \
+            (self.cols is None or 0 <= col < self.cols)
+
+    def __getitem__(self, pos: tuple):
+        """the value at (row, col), 0 for a blank."""
+        return self.stones.get(pos, 0)
+
+    def __len__(self):
+        return len(self.stones)
+
+    def make(self, row: int, col: int, value: int = None):
+        """Play at the blank (row, col), by the piece to play by default."""
+        if not self.inside(row, col) or (row, col) in self.stones:
+            raise ValueError(f'not a blank: {(row, col)}')
+        if value is None:
+            value = self.to_move
+        self.stones[row, col] = value
+        self.moves.append((row, col))
+        box = self.box
+        if box is None:
+            self.box = (row, row, col, col)
+        else:
+            self.box = (min(box[0], row), max(box[1], row),
+                        min(box[2], col), max(box[3], col))
+        self.boxes.append(box)
+
+    def unmake(self):
+        """
+        Take the last play back.
+
+        Returns
+        -------
+        row, col: the play taken back.
+        """
+        row, col = self.moves.pop()
+        del self.stones[row, col]
+        self.box = self.boxes.pop()
+        return row, col
+
+    def won(self, pieces_in_line: int = 5):
+        """True if the last play makes `pieces_in_line` in a row."""
+        if not self.moves:
+            return False
+        row, col = self.moves[-1]
+        return check_stones(self.stones, self.stones[row, col], row, col,
+                            pieces_in_line)
+
+    def full(self):
+        """True if there is no blank, never for an unbounded board."""
+        return self.rows is not None and self.cols is not None and \
+            len(self.stones) == self.rows * self.cols
+
+    def clear(self):
+        self.stones.clear()
+        self.moves.clear()
+        self.box = None
+        self.boxes.clear()
+
+    def window(self, margin: int = MARGIN, size: int = WINDOW):
+        """
+        The dense board of the stones and the blanks around them.
+
+        Parameters
+        ----------
+        size: int
+            max rows and cols, None for no limit.
+
+        Returns
+        -------
+        grid: np.ndarray
+            int8 array of the bounding box and `margin` blanks around it,
+            cut to `size` cells around the last play and by the board 
+            edges. around the center if there is no stone.
+        row0, col0: int
+            the place of grid[0, 0] on the board.
+        """
+        if self.box is None:
+            row, col = self.center
+            box = row, row, col, col
+        else:
+            row, col = self.moves[-1]
+            box = self.box
+        row0, row1 = cut(box[0] - margin, box[1] + margin + 1, row, size, 
+                         self.rows)
+        col0, col1 = cut(box[2] - margin, box[3] + margin + 1, col, size, 
+                         self.cols)
+        grid = np.zeros((row1 - row0, col1 - col0), dtype=np.int8)
+        for (row, col), value in self.stones.items():
+            if row0 <= row < row1 and col0 <= col < col1:
+                grid[row - row0, col - col0] = value
+        return grid, row0, col0
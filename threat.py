@@ -0,0 +1,393 @@
+"""
+Threat-space search.
+
+Most games are decided by forcing sequences. The solver only looks at the
+threat plays of the attacker and the forced replies of the defender:
+
+- VCF (Victory by Continuous Fours): every play of the attacker makes a
+  four, so the defender has to block the five.
+- VCT (Victory by Continuous Threats): the attacker may also make a live
+  three, the defender then tries every blank of the line of the three, and
+  every play that makes a four of its own.
+
+So the solver reaches forced wins much deeper than a full-width search.
+When a line is not tried because of the limits, it is taken as not winning,
+so a win found is a real one.
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import time
+import numpy as np
+from jitcache import njit, objmode
+from utils import check_value
+from evaluation import CENTER, DIRECTIONS, FOUR, LIVE_THREE, PATTERN_TYPE, window_code
+from ordering import place_pattern
+
+# index of the limits array.
+LIMIT_NODES = 0      # nodes visited.
+LIMIT_MAX_NODES = 1  # stop when the nodes reach it.
+LIMIT_ABORTED = 2    # set to 1 when stopped by the limits.
+NUM_LIMITS = 3
+# the clock is read once every `TIME_CHECK_NODES` nodes.
+TIME_CHECK_NODES = 256
+# max blanks in the 4 lines within 4 of a cell.
+LINE_CELLS = 32
+
+
+def threat_buffers(plies: int, cells: int):
+    """
+    The per-node buffers of `vcf` and `vct`, allocated once per search 
+    instead of once per node. A node of `vcf` uses the rows `depth`, and 
+    a node of `vct` the rows `vcf_depth + depth`, so no two nodes on the 
+    path of the search share a row.
+
+    Parameters
+    ----------
+    plies: int
+        number of rows, `vcf_depth + vct_depth + 1`.
+    cells: int
+        cells of the board.
+
+    Returns
+    -------
+    moves, defends, wins, threats, types: np.ndarray
+        int64 arrays, a row of the first four holds the threat plays of a 
+        node, the replies of the defender, the fives of the attacker and of 
+        the defender. `types` is the scratch of `threat_moves`.
+    """
+    return (np.empty((plies, cells), dtype=np.int64),
+            np.empty((plies, cells + LINE_CELLS), dtype=np.int64),
+            np.empty((plies, LINE_CELLS), dtype=np.int64),
+            np.empty((plies, LINE_CELLS), dtype=np.int64),
+            np.empty(cells + LINE_CELLS, dtype=np.int64))
+
+
+@njit(cache=True)
+def over_limits(limits: np.ndarray, deadline: float):
+    """Count a node, returns True if the search should stop."""
+    limits[LIMIT_NODES] += 1
+    if limits[LIMIT_ABORTED] != 0:
+        return True
+    if limits[LIMIT_NODES] >= limits[LIMIT_MAX_NODES]:
+        limits[LIMIT_ABORTED] = 1
+    elif limits[LIMIT_NODES] % TIME_CHECK_NODES == 0 and deadline < np.inf:
+        with objmode(now='float64'):
+            now = time.perf_counter()
+        if now >= deadline:
+            limits[LIMIT_ABORTED] = 1
+    return limits[LIMIT_ABORTED] != 0
+
+
+@njit(cache=True)
+def line_fives(board: np.ndarray, value: int, row: int, col: int,
+            out: np.ndarray):
+    """
+    Blanks that make a five with the piece at (row, col).
+
+    Returns
+    -------
+    n: int
+        number of the blanks, their indexes are `out[:n]`.
+    """
+    n = 0
+    for d in range(4):
+        dr = DIRECTIONS[d, 0]
+        dc = DIRECTIONS[d, 1]
+        for k in range(-CENTER, CENTER + 1):
+            r = row + k * dr
+            c = col + k * dc
+            if k == 0 or r < 0 or r >= board.shape[0] or c < 0 or \
+                    c >= board.shape[1] or board[r, c] != 0:
+                continue
+            board[r, c] = value
+            if check_value(board, value, r, c):
+                out[n] = r * board.shape[1] + c
+                n += 1
+            board[r, c] = 0
+    return n
+
+
+@njit(cache=True)
+def all_fives(board: np.ndarray, value: int, out: np.ndarray):
+    """Blanks of the whole board that make a five, see `line_fives`."""
+    n = 0
+    for row in range(board.shape[0]):
+        for col in range(board.shape[1]):
+            if board[row, col] != 0:
+                continue
+            board[row, col] = value
+            if check_value(board, value, row, col):
+                if n < out.shape[0]:
+                    out[n] = row * board.shape[1] + col
+                n += 1
+            board[row, col] = 0
+    return n
+
+
+@njit(cache=True)
+def threat_moves(board: np.ndarray, value: int, min_type: int,
+                out: np.ndarray, types: np.ndarray):
+    """
+    Blanks that make a pattern of `min_type` or better, `types` is a 
+    buffer as long as `out` for their pattern types.
+
+    Returns
+    -------
+    n: int
+        number of the blanks, their indexes are `out[:n]`, the better
+        patterns first.
+    """
+    n = 0
+    for row in range(board.shape[0]):
+        for col in range(board.shape[1]):
+            if board[row, col] != 0:
+                continue
+            best, score = place_pattern(board, value, row, col)
+            if best >= min_type:
+                out[n] = row * board.shape[1] + col
+                types[n] = best
+                n += 1
+    # insertion sort by the type, n is small.
+    for i in range(1, n):
+        idx = out[i]
+        t = types[i]
+        k = i - 1
+        while k >= 0 and types[k] < t:
+            out[k + 1] = out[k]
+            types[k + 1] = types[k]
+            k -= 1
+        out[k + 1] = idx
+        types[k + 1] = t
+    return n
+
+
+@njit(cache=True)
+def vcf(board: np.ndarray, attacker: int, depth: int, forced: int,
+        limits: np.ndarray, deadline: float, move_rows: np.ndarray,
+        defend_rows: np.ndarray, win_rows: np.ndarray,
+        threat_rows: np.ndarray, types: np.ndarray):
+    """
+    Search for a VCF of the attacker.
+
+    Parameters
+    ----------
+    board: np.ndarray
+        the game board, restored before returning.
+    attacker: int
+        enum value of the piece of the attacker, who is to play.
+    depth: int
+        max fours of the attacker.
+    forced: int
+        the blank the attacker must play to stop a five of the defender,
+        -1 if there is none.
+    limits: np.ndarray
+        int64 array of the node limit, see `LIMIT_NODES`.
+    deadline: float
+        time.perf_counter() to stop, inf for no limit.
+    move_rows, defend_rows, win_rows, threat_rows, types: np.ndarray
+        the buffers of `threat_buffers`, the node uses the rows `depth`.
+
+    Returns
+    -------
+    idx: int
+        the first play of a VCF, -1 if not found.
+    """
+    if over_limits(limits, deadline):
+        return -1
+    defender = 3 - attacker
+    cols = board.shape[1]
+    moves = move_rows[depth]
+    wins = win_rows[depth]
+    threats = threat_rows[depth]
+    if forced >= 0:
+        n = 1
+        moves[0] = forced
+    else:
+        n = threat_moves(board, attacker, FOUR, moves, types)
+    for i in range(n):
+        m = moves[i]
+        row = m // cols
+        col = m % cols
+        board[row, col] = attacker
+        if check_value(board, attacker, row, col):
+            board[row, col] = 0
+            return m
+        k = line_fives(board, attacker, row, col, wins)
+        if k >= 2:
+            board[row, col] = 0
+            return m
+        found = False
+        if k == 1 and depth > 1:
+            block = wins[0]
+            board[block // cols, block % cols] = defender
+            f = line_fives(board, defender, block // cols, block % cols, threats)
+            if f < 2:
+                next_forced = threats[0] if f == 1 else -1
+                found = vcf(board, attacker, depth - 1, next_forced,
+                            limits, deadline, move_rows, defend_rows,
+                            win_rows, threat_rows, types) >= 0
+            board[block // cols, block % cols] = 0
+        board[row, col] = 0
+        if found:
+            return m
+        if limits[LIMIT_ABORTED] != 0:
+            break
+    return -1
+
+
+@njit(cache=True)
+def vct(board: np.ndarray, attacker: int, depth: int, vcf_depth: int,
+        forced: int, limits: np.ndarray, deadline: float,
+        move_rows: np.ndarray, defend_rows: np.ndarray, win_rows: np.ndarray,
+        threat_rows: np.ndarray, types: np.ndarray):
+    """
+    Search for a VCT of the attacker.
+
+    Parameters
+    ----------
+    depth: int
+        max threats of the attacker.
+    vcf_depth: int
+        max fours of the VCF tried at every node.
+
+    see `vcf` for the others.
+
+    Returns
+    -------
+    idx: int
+        the first play of a VCT, -1 if not found.
+    """
+    m = vcf(board, attacker, vcf_depth, forced, limits, deadline, move_rows,
+            defend_rows, win_rows, threat_rows, types)
+    if m >= 0 or forced >= 0 or depth <= 0 or limits[LIMIT_ABORTED] != 0:
+        return m
+    if over_limits(limits, deadline):
+        return -1
+    defender = 3 - attacker
+    cols = board.shape[1]
+    # the rows below `vcf_depth` are used by the VCFs.
+    slot = vcf_depth + depth
+    moves = move_rows[slot]
+    defends = defend_rows[slot]
+    wins = win_rows[slot]
+    threats = threat_rows[slot]
+    n = threat_moves(board, attacker, LIVE_THREE, moves, types)
+    for i in range(n):
+        m = moves[i]
+        row = m // cols
+        col = m % cols
+        board[row, col] = attacker
+        k = line_fives(board, attacker, row, col, wins)
+        if k >= 2:
+            board[row, col] = 0
+            return m
+        if k == 1:
+            # a four, the only defence is the five.
+            nd = 1
+            defends[0] = wins[0]
+        else:
+            # a three, the blanks of its line, or a four of the defender.
+            nd = 0
+            for d in range(4):
+                dr = DIRECTIONS[d, 0]
+                dc = DIRECTIONS[d, 1]
+                code = window_code(board, attacker, row, col, dr, dc)
+                if PATTERN_TYPE[code] != LIVE_THREE:
+                    continue
+                for s in range(-CENTER, CENTER + 1):
+                    r = row + s * dr
+                    c = col + s * dc
+                    if 0 <= r < board.shape[0] and 0 <= c < cols and \
+                            board[r, c] == 0:
+                        defends[nd] = r * cols + c
+                        nd += 1
+            nd += threat_moves(board, defender, FOUR, defends[nd:], types)
+        refuted = False
+        for j in range(nd):
+            block = defends[j]
+            board[block // cols, block % cols] = defender
+            f = line_fives(board, defender, block // cols, block % cols, threats)
+            if f >= 2:
+                refuted = True
+            else:
+                next_forced = threats[0] if f == 1 else -1
+                if vct(board, attacker, depth - 1, vcf_depth, next_forced,
+                        limits, deadline, move_rows, defend_rows, win_rows,
+                        threat_rows, types) < 0:
+                    refuted = True
+            board[block // cols, block % cols] = 0
+            if refuted:
+                break
+        board[row, col] = 0
+        if not refuted:
+            return m
+        if limits[LIMIT_ABORTED] != 0:
+            break
+    return -1
+
+
+@njit(nogil=True, cache=True)
+def solve(board: np.ndarray, attacker: int, vcf_depth: int, vct_depth: int,
+        limits: np.ndarray, deadline: float, buffers: tuple):
+    """
+    Search for a forced win of the attacker, who is to play. `buffers` is 
+    `threat_buffers(vcf_depth + vct_depth + 1, board.size)` or larger.
+
+    Returns
+    -------
+    idx: int
+        the first play of the win, -1 if not found.
+    """
+    fives = np.empty(2, dtype=np.int64)
+    if all_fives(board, attacker, fives) > 0:
+        return fives[0]
+    n = all_fives(board, 3 - attacker, fives)
+    if n >= 2:
+        # can't stop both.
+        return -1
+    forced = fives[0] if n == 1 else -1
+    move_rows, defend_rows, win_rows, threat_rows, types = buffers
+    if vct_depth > 0:
+        return vct(board, attacker, vct_depth, vcf_depth, forced, limits,
+                   deadline, move_rows, defend_rows, win_rows, threat_rows,
+                   types)
+    return vcf(board, attacker, vcf_depth, forced, limits, deadline,
+               move_rows, defend_rows, win_rows, threat_rows, types)
+
+
+def find_win(board: np.ndarray, piece: int, vcf_depth: int = 10,
+            vct_depth: int = 2, max_nodes: int = 100000,
+            time_limit: float = None):
+    """
+    Search for a forced win of `piece`, who is to play.
+
+    Parameters
+    ----------
+    board: np.ndarray
+        the game board, not changed.
+    piece: int
+        enum value of Piece.black or Piece.white.
+    vcf_depth: int
+        max fours of the attacker in a VCF.
+    vct_depth: int
+        max threats of the attacker in a VCT, 0 for VCF only.
+    max_nodes: int
+        max nodes to search.
+    time_limit: float
+        max seconds to search, None for no limit.
+
+    Returns
+    -------
+    pos: tuple_of_int or None
+        (row, col) of the first play of the win, None if not found.
+    nodes: int
+        nodes visited.
+    """
+    limits = np.zeros(NUM_LIMITS, dtype=np.int64)
+    limits[LIMIT_MAX_NODES] = max_nodes
+    deadline = np.inf if time_limit is None else time.perf_counter() + time_limit
+    buffers = threat_buffers(vcf_depth + vct_depth + 1, board.size)
+    idx = solve(board, piece, vcf_depth, vct_depth, limits, deadline, buffers)
+    if idx < 0:
+        return None, int(limits[LIMIT_NODES])
+    return divmod(int(idx), board.shape[1]), int(limits[LIMIT_NODES])
@@ -0,0 +1,214 @@
+"""
+Zobrist hashing and transposition table for the search engine.
+
+The table is shared by the threads of the search without a lock. An entry
+does not keep the key itself but `key ^ tt_data(...)` of its fields, so a
+reader that takes the fields of an entry while another thread writes it
+finds the check wrong, and treats the entry as a miss, instead of using
+the score of one position with the bound or the move of another.
+
+Copyright (c) 2022 falwat, under MIT License.
+"""
+import numpy as np
+from jitcache import njit
+
+# bound type of the score saved in the table.
+EXACT = 0
+LOWER = 1
+UPPER = 2
+
+TT_ENTRY = np.dtype([
+    ('check', np.uint64),   # key ^ tt_data of the other fields.
+    ('score', np.float64),
+    ('move', np.int32),
+    ('depth', np.int8),
+    ('flag', np.int8),
+    ('age', np.uint8),
+], align=True)
+
+
+def zobrist_keys(rows: int, cols: int, seed: int = 0) -> np.ndarray:
+    """
+    Create the random Zobrist keys of a board.
+
+    Parameters
+    ----------
+    rows, cols: int
+        the board size.
+    seed: int
+        seed of the random generator.
+
+    Returns
+    -------
+    keys: np.ndarray
+        uint64 array of shape (3, rows * cols), `keys[piece, index]` is the
+        key of `piece` at `index` (row * cols + col). `keys[0]` is zero, so an
+        empty position does not change the hash.
+    """
+    rng = np.random.default_rng(seed)
+    keys = rng.integers(1, np.iinfo(np.uint64).max, size=(3, rows * cols),
+                        dtype=np.uint64, endpoint=True)
+    keys[0] = 0
+    return keys
+
+
+def mix64(z: np.ndarray):
+    """The finalizer of splitmix64, a uint64 array to well mixed bits."""
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def coordinate_keys(row0: int, col0: int, rows: int, cols: int, 
+                    seed: int = 0) -> np.ndarray:
+    """
+    The Zobrist keys of a window of an unbounded board.
+
+    The key of a piece at a place is a hash of the board coordinates of 
+    the place, so a position has the same hash in any window holding its 
+    stones, see `sparse.SparseBoard.window`.
+
+    Parameters
+    ----------
+    row0, col0: int
+        the board coordinates of the cell (0, 0) of the window.
+    rows, cols: int
+        the window size.
+
+    Returns
+    -------
+    keys: np.ndarray
+        uint64 array of shape (3, rows * cols), as `zobrist_keys`.
+    """
+    r = (np.arange(rows, dtype=np.int64) + row0).view(np.uint64)[:, None]
+    c = (np.arange(cols, dtype=np.int64) + col0).view(np.uint64)[None, :]
+    keys = np.zeros((3, rows * cols), dtype=np.uint64)
+    for piece in (1, 2):
+        z = r * np.uint64(0x9E3779B97F4A7C15) ^ \
+            c * np.uint64(0xC2B2AE3D27D4EB4F) ^ np.uint64(piece + 3 * seed)
+        keys[piece] = mix64(mix64(z)).ravel()
+    return keys
+
+
+@njit(cache=True)
+def board_hash(board: np.ndarray, keys: np.ndarray):
+    """
+    Zobrist hash of the whole board.
+
+    During the search, the hash is updated incrementally by
+    `h ^ keys[piece, index]` for every play.
+    """
+    h = np.uint64(0)
+    for row in range(board.shape[0]):
+        for col in range(board.shape[1]):
+            p = int(board[row, col])
+            if p != 0:
+                h ^= keys[p, row * board.shape[1] + col]
+    return h
+
+
+@njit(cache=True)
+def tt_data(score: float, move: int, depth: int, flag: int, age: int):
+    """The fields of an entry packed in 64 bits, for the check."""
+    return np.float64(score).view(np.uint64) ^ (
+        np.uint64(move & 0xffffffff) | 
+        (np.uint64(depth & 0xff) << np.uint64(32)) | 
+        (np.uint64(flag & 0xff) << np.uint64(40)) | 
+        (np.uint64(age & 0xff) << np.uint64(48)))
+
+
+@njit(cache=True)
+def tt_probe(table: np.ndarray, key):
+    """
+    Find `key` in the table.
+
+    The fields are read once, and used only if the check of the entry 
+    matches them, see the module docstring.
+
+    Returns
+    -------
+    found: bool
+    score: float
+    move, depth, flag: int
+        the fields of the entry, meaningless if not found.
+    """
+    i = np.int64(key & np.uint64(table.shape[0] - 1))
+    e = table[i]
+    check = e.check
+    score = e.score
+    move = e.move
+    depth = e.depth
+    flag = e.flag
+    age = e.age
+    found = depth >= 0 and check ^ tt_data(score, move, depth, flag, age) == key
+    return found, score, int(move), int(depth), int(flag)
+
+
+@njit(cache=True)
+def tt_store(table: np.ndarray, key, age: int, depth: int, flag: int,
+            score: float, move: int):
+    """
+    Save a search result in the table.
+
+    The entry of the slot is replaced when it holds the same position, when
+    it was written by an older search, or when it was searched no deeper
+    than the new result. So memory is bounded by the table size and the
+    deep results of the current search are kept.
+    """
+    i = np.int64(key & np.uint64(table.shape[0] - 1))
+    e = table[i]
+    same = e.check ^ tt_data(e.score, e.move, e.depth, e.flag, e.age) == key
+    if e.depth < 0 or same or e.age != age or e.depth <= depth:
+        e.score = score
+        e.move = move
+        e.depth = depth
+        e.flag = flag
+        e.age = age
+        # the check last, a reader of the fields written so far misses.
+        e.check = key ^ tt_data(score, move, depth, flag, age)
+
+
+class TranspositionTable:
+    def __init__(self, size: int = 1 << 20) -> None:
+        """
+        Fixed size transposition table.
+
+        Parameters
+        ----------
+        size: int
+            number of entries, rounded up to a power of two.
+        """
+        size = 1 << max(0, int(size) - 1).bit_length()
+        self.table = np.zeros(size, dtype=TT_ENTRY)
+        self.age = 0
+        self.clear()
+
+    def clear(self):
+        """Remove all entries, used when a new game starts."""
+        self.table['depth'] = -1
+        self.age = 0
+
+    def shift(self, old_cols: int, rows: int, cols: int, dr: int, dc: int):
+        """
+        Move the plays of the entries to another window of the board, used 
+        with `coordinate_keys`. The play (r, c) of the old window of 
+        `old_cols` columns is (r + dr, c + dc) in the new window of rows by 
+        cols, and none if it is out of it.
+        """
+        move = self.table['move']
+        used = np.nonzero(move >= 0)[0]
+        old = move[used]
+        r, c = np.divmod(old, old_cols)
+        r += dr
+        c += dc
+        inside = (r >= 0) & (r < rows) & (c >= 0) & (c < cols)
+        new = np.where(inside, r * cols + c, -1).astype(np.int32)
+        move[used] = new
+        # the move is the low 32 bits of `tt_data`.
+        mask = np.uint64(0xffffffff)
+        self.table['check'][used] ^= (old.astype(np.int64).view(np.uint64) & mask) ^ \
+            (new.astype(np.int64).view(np.uint64) & mask)
+
+    def new_search(self):
+        """Mark the entries written before as old, so they are replaced first."""
+        self.age = (self.age + 1) & 0xff
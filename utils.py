@@ -5,7 +5,7 @@ Copyright (c) 2022 falwat, under MIT License.
 """
 from enum import Enum
 import numpy as np
-from numba import  njit
+from jitcache import njit
 
 class Piece(Enum):
     """
@@ -43,62 +43,81 @@ def check(board: np.ndarray, piece, row: int, col: int, pieces_in_line: int = 5)
         value = piece.value
     else:
         value = piece
-    row0: int = -1
-    col0: int = -1
-    row1: int = -1
-    col1: int = -1
-    winning = False
+    winning, row0, col0, row1, col1 = check_segment(board, value, row, col, 
+                                                    pieces_in_line)
+    return winning, (row0, col0, row1, col1)
+
+
+@njit(cache=True)
+def check_segment(board: np.ndarray, value: int, row: int, col: int, 
+                    pieces_in_line: int = 5):
+    """
+    Check for winning around the last piece.
+
+    Only the cells within `pieces_in_line - 1` from (row, col) in the 
+    4 directions are read, so the cost does not depend on the board size.
+
+    Parameters
+    ----------
+    board : np.ndarray
+        the game board.
+    value: int
+        check for enum value of Piece.black or Piece.white.
+    row : int
+        row of last piece.
+    col : int
+        column of last piece.
+    pieces_in_line : int
+        pieces in line that winning. default is 5.
+
+    Returns
+    -------
+    winning : bool
+        True, the player won and the game over; 
+        False, the player not won and the game continue.
+    row0, col0, row1, col1: int
+        when winning is True, the position of pieces in line, otherwise -1.
+    """
+    if board[row, col] != value:
+        return False, -1, -1, -1, -1
     for t in range(4):
-        if winning:
-            break
         if t == 0:
             # horizon
-            line = board[row]
-            rows = row * np.ones(board.shape[1])
-            cols = np.arange(board.shape[0])
+            dr, dc = 0, 1
         elif t == 1:
             # vertical
-            line = board[:, col]
-            rows = np.arange(board.shape[0])
-            cols = col * np.ones(board.shape[1])
+            dr, dc = 1, 0
         elif t == 2:
             # diagnal LU->RD
-            line = np.diagonal(board, col - row)
-            if row < col:
-                rows = np.arange(len(line))
-                cols = col - row + rows
-            else:
-                cols = np.arange(len(line))
-                rows = row - col + cols
-        elif t == 3:
-            fliped_row = board.shape[0] - row - 1
+            dr, dc = 1, 1
+        else:
             # dianal LD->RU
-            line = np.diagonal(np.flipud(board),  col - fliped_row)
-            if row + col <= board.shape[0]:
-                cols = np.arange(len(line))
-                rows = row + col - cols
-            else:
-                rows = np.arange(board.shape[0]-1, board.shape[0]-len(line)-1, -1)
-                cols = row + col - rows
-                # rows = fliped_row - col + cols
-        count = 0
-        for i, p in enumerate(line):
-            if p == value:
-                if count == 0:
-                    row0 = rows[i]
-                    col0 = cols[i]
-                count += 1
-                if count == pieces_in_line:
-                    row1 = rows[i]
-                    col1 = cols[i]
-                    winning = True
-                    break
-            else:
-                count = 0
-    return winning, (row0, col0, row1, col1)
+            dr, dc = -1, 1
+        back = 0
+        r = row - dr
+        c = col - dc
+        while back < pieces_in_line - 1 and 0 <= r < board.shape[0] and \
+                0 <= c < board.shape[1] and board[r, c] == value:
+            back += 1
+            r -= dr
+            c -= dc
+        forward = 0
+        r = row + dr
+        c = col + dc
+        while forward < pieces_in_line - 1 and 0 <= r < board.shape[0] and \
+                0 <= c < board.shape[1] and board[r, c] == value:
+            forward += 1
+            r += dr
+            c += dc
+        if back + forward + 1 >= pieces_in_line:
+            row0 = row - back * dr
+            col0 = col - back * dc
+            return (True, row0, col0, row0 + (pieces_in_line - 1) * dr, 
+                    col0 + (pieces_in_line - 1) * dc)
+    return False, -1, -1, -1, -1
 
 
-@njit
+@njit(cache=True)
 def check_value(board: np.ndarray, value: int, row: int, col: int, pieces_in_line: int = 5):
     """
     Check for winning.
@@ -122,51 +141,7 @@ def check_value(board: np.ndarray, value: int, row: int, col: int, pieces_in_lin
         True, the player won and the game over; 
         False, the player not won and the game continue.
     """
-    winning = False
-    for t in range(4):
-        if winning:
-            break
-        if t == 0:
-            # horizon
-            line = board[row]
-            rows = row * np.ones(board.shape[1])
-            cols = np.arange(board.shape[0])
-        elif t == 1:
-            # vertical
-            line = board[:, col]
-            rows = np.arange(board.shape[0])
-            cols = col * np.ones(board.shape[1])
-        elif t == 2:
-            # diagnal LU->RD
-            offset = col - row
-            line = np.diag(board, offset)
-            if row < col:
-                rows = np.arange(len(line))
-                cols = col - row + rows
-            else:
-                cols = np.arange(len(line))
-                rows = row - col + cols
-        elif t == 3:
-            fliped_row = board.shape[0] - row - 1
-            # dianal LD->RU
-            line = np.diag(np.flipud(board),  col - fliped_row)
-            if row + col <= board.shape[0]:
-                cols = np.arange(len(line))
-                rows = row + col - cols
-            else:
-                rows = np.arange(board.shape[0]-1, board.shape[0]-len(line)-1, -1)
-                cols = row + col - rows
-                # rows = fliped_row - col + cols
-        count = 0
-        for i, p in enumerate(line):
-            if p == value:
-                count += 1
-                if count == pieces_in_line:
-                    winning = True
-                    break
-            else:
-                count = 0
-    return winning
+    return check_segment(board, value, row, col, pieces_in_line)[0]
 
 
 def show_board(board: np.ndarray):